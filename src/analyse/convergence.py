@@ -0,0 +1,150 @@
+"""
+convergence summary of an experiment folder, computed once and shared by
+the convergence figures and tables
+
+the convergence of each run to each tolerance level is collected to
+(runs, tolerance levels) matrices of iterations, totaltime and observations,
+nan where the run did not converge, and summarized over the runs:
+mean and quantiles of the converged runs and distraction rate,
+the proportion of runs that do not converge to the tolerance level
+
+summaries are cached by the runs of the folder and the signatures of their
+source files in the experiment repository, so a folder that is preprocessed
+again is summarized again
+the cache is per process, summarize_folders computes the summaries before
+the figures are rendered, they are passed to the render processes,
+see cached and update_cache
+"""
+
+import numpy as np
+import threading
+import src.io.repository as repository
+
+KEYS = ('iterations', 'totaltime', 'observations')
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+_CACHE = {}
+_LOCK = threading.Lock() # the rules of snakemake run in threads
+
+def convergence_matrix(folder, key):
+    """
+    return (runs, tolerance levels) matrix of {key}_to_gmp_convergence,
+    runs with fewer tolerance levels are padded with nan
+    """
+    rows = [np.asarray(exp[key], dtype = float).reshape(-1) for exp in folder]
+    N = max([len(row) for row in rows] + [0])
+    ret = np.full((len(rows), N), np.nan)
+    for i, row in enumerate(rows):
+        ret[i,:len(row)] = row
+    return ret
+
+def column_quantiles(values, quantiles = QUANTILES):
+    """
+    return quantiles of the non nan values of each column,
+    shape (quantiles, columns), nan for columns without values
+    """
+    ret = np.full((len(quantiles), values.shape[1]), np.nan)
+    valid = ~np.isnan(values)
+    counts = np.count_nonzero(valid, axis = 0)
+    # nan sorts last, the first count values of a column are its values
+    values = np.sort(values, axis = 0)
+    for j in np.flatnonzero(counts):
+        ret[:,j] = np.quantile(values[:counts[j],j], quantiles)
+    return ret
+
+def summarize(folder):
+    """
+    return convergence summary of a folder (list of run dicts) as dict:
+    runs: number of runs
+    tolerances: (runs, tolerance levels) matrix of the tolerance levels
+    tolerance_levels: tolerance levels, mean over the runs
+    {key}: (runs, tolerance levels) matrix of each key in KEYS
+    {key}_mean: mean over the converged runs
+    {key}_quantiles: QUANTILES of the converged runs, shape (quantiles, tolerance levels)
+    distraction_rate: proportion of runs that do not converge (totaltime is nan)
+    """
+    ret = {'runs': len(folder)}
+    ret['tolerances'] = convergence_matrix(folder, 'tolerance_levels')
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        ret['tolerance_levels'] = np.nansum(ret['tolerances'], axis = 0)/ \
+                np.count_nonzero(~np.isnan(ret['tolerances']), axis = 0)
+        for key in KEYS:
+            values = convergence_matrix(folder, f'{key}_to_gmp_convergence')
+            converged = np.count_nonzero(~np.isnan(values), axis = 0)
+            ret[key] = values
+            ret[f'{key}_mean'] = np.nansum(values, axis = 0)/converged
+            ret[f'{key}_quantiles'] = column_quantiles(values)
+        ret['distraction_rate'] = np.count_nonzero(np.isnan(ret['totaltime']), axis = 0)/len(folder)
+    return ret
+
+def run_source(exp):
+    """
+    return (folder, run name) of a run dict named {folder}_{N}
+    """
+    folder, number = str(exp['name']).rsplit('_', 1)
+    return folder, f'exp_{number}'
+
+def folder_key(folder):
+    """
+    return cache key of a folder, (folder, run name) of its runs and
+    signatures of their source files, None if a run has no source file
+    """
+    try:
+        sources = tuple(run_source(exp) for exp in folder)
+        runs = {}
+        for name, run in sources:
+            runs.setdefault(name, []).append(run)
+        signatures = []
+        for name, names in runs.items():
+            signature = repository.signatures(name, names)
+            signatures.extend(signature[run] for run in names)
+    except (OSError, ValueError):
+        return None
+    return sources, tuple(signatures)
+
+def folder_summary(folder):
+    """
+    return cached convergence summary of a folder, see summarize,
+    the summary is shared, callers should not modify it
+    folders without source files in the repository are not cached
+    """
+    key = folder_key(folder)
+    if key is None:
+        return summarize(folder)
+    with _LOCK:
+        summary = _CACHE.get(key)
+    if summary is None:
+        summary = summarize(folder)
+        with _LOCK: # a summary of another thread is kept
+            summary = _CACHE.setdefault(key, summary)
+    return summary
+
+def summarize_folders(folders):
+    """
+    compute the summaries of folders to the cache, e.g. before the render
+    processes are started
+    """
+    for folder in folders:
+        folder_summary(folder)
+
+def cached():
+    """
+    return copy of the cached summaries, e.g. for the render processes
+    """
+    with _LOCK:
+        return dict(_CACHE)
+
+def update_cache(summaries):
+    """
+    add summaries returned by cached() of another process
+    """
+    with _LOCK:
+        _CACHE.update(summaries)
+
+def clear_cache():
+    """
+    drop cached summaries
+    """
+    with _LOCK:
+        _CACHE.clear()
@@ -0,0 +1,56 @@
+"""
+statistics of values grouped by a key, e.g. convergence times grouped by
+the number of secondary initpts, computed at once for all groups
+"""
+
+import numpy as np
+
+# MAD of normal distribution times this is its standard deviation
+MAD_TO_SD = 1.4826
+
+def group_median(inverse, values, counts):
+    """
+    return median of values of each group
+    inverse: group index of each value
+    counts: number of values in each group
+    """
+    sorted_values = values[np.lexsort((values, inverse))]
+    starts = np.cumsum(counts) - counts
+    low = starts + (counts-1)//2
+    high = starts + counts//2
+    return (sorted_values[low] + sorted_values[high])/2
+
+def group_stats(groups, values):
+    """
+    return dict of statistics of values grouped by groups:
+    group (unique groups), inverse (group index of each value),
+    count, mean, std, median and mad (median absolute deviation) of each group
+    """
+    groups = np.asarray(groups)
+    values = np.asarray(values, dtype = float)
+    group, inverse, count = np.unique(groups, return_inverse = True, return_counts = True)
+    inverse = np.reshape(inverse, -1)
+    mean = np.bincount(inverse, weights = values)/count
+    var = np.bincount(inverse, weights = (values - mean[inverse])**2)/count
+    median = group_median(inverse, values, count)
+    mad = group_median(inverse, np.abs(values - median[inverse]), count)
+    return {'group': group, 'inverse': inverse, 'count': count, 'mean': mean,
+            'std': np.sqrt(var), 'median': median, 'mad': mad}
+
+def outliers(groups, values, threshold = 2.5, robust = False):
+    """
+    return true for values that are more than threshold standard deviations
+    above the mean of their group (z-score),
+    or if robust, above the median with standard deviation estimated from MAD
+    """
+    stats = group_stats(groups, values)
+    inverse = stats['inverse']
+    if robust:
+        center = stats['median']
+        scale = MAD_TO_SD*stats['mad']
+    else:
+        center = stats['mean']
+        scale = stats['std']
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        z = (np.asarray(values, dtype = float) - center[inverse])/scale[inverse]
+    return z > threshold
@@ -1,7 +1,11 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import kruskal
-from scipy.stats import chi2
+import src.analyse.convergence as convergence
+import src.io.lazy as lazy
+
+# heavy modules are imported on first use
+plt = lazy.module('matplotlib.pyplot')
+stats = lazy.module('scipy.stats')
+spatial = lazy.module('scipy.spatial')
 
 def get_exp_namebases(folders):
     """
@@ -22,9 +26,9 @@ def calc_fx_sumstat(folder):
     ret = [N_exp]
     fxlist = []
     for exp in folder:
-        fx = np.array(exp['xy'])[:,-1]
+        fx = np.asarray(exp['xy'])[:,-1]
         fxlist.append(fx)
-    fxlist = np.array(fxlist).flatten()
+    fxlist = np.concatenate(fxlist)
     # obs mean
     ret.append(np.mean(fxlist))
     # var
@@ -58,6 +62,68 @@ def summarize_folders_fx(folders):
         ret.append(sumstat)
     return ret, colnames, rownames
 
+class OnlineCovariance:
+    """
+    streaming covariance of variables, observations are added in batches
+    and merged with the parallel (Chan et al.) form of Welford's algorithm
+    N_vars: number of variables
+    """
+    def __init__(self, N_vars):
+        self.n = 0
+        self.mean = np.zeros(N_vars)
+        self.M2 = np.zeros((N_vars, N_vars)) # sums of products of deviations
+
+    def update(self, batch):
+        """
+        add observations, batch: array of shape (observations, variables)
+        """
+        batch = np.asarray(batch, dtype = float)
+        m = len(batch)
+        if m == 0:
+            return
+        batch_mean = np.mean(batch, axis = 0)
+        centered = batch - batch_mean
+        delta = batch_mean - self.mean
+        n = self.n + m
+        self.M2 += centered.T.dot(centered) + np.outer(delta, delta)*self.n*m/n
+        self.mean += delta*m/n
+        self.n = n
+
+    def covariance(self, ddof = 1):
+        return self.M2/(self.n-ddof)
+
+    def correlation(self):
+        sd = np.sqrt(np.diag(self.M2))
+        return self.M2/np.outer(sd, sd)
+
+def output_batches(explist, chunksize = None):
+    """
+    yield observations of equally queried experiments as arrays of
+    shape (observations, experiments), chunksize observations at a time
+    """
+    outputs = [np.asarray(exp['xy'])[:,-1] for exp in explist]
+    N = len(outputs[0]) if outputs else 0
+    if any(len(y) != N for y in outputs):
+        raise ValueError("experiments have different number of observations")
+    chunksize = chunksize or max(N, 1)
+    for begin in range(0, N, chunksize):
+        yield np.column_stack([y[begin:begin+chunksize] for y in outputs])
+
+def covariance_correlation(explist, chunksize = None):
+    """
+    accumulate outputs of equally queried sobol experiments
+    from different simulators
+    params;
+    explist: list of experiments
+    chunksize: number of observations read at a time, defaults to all
+    return;
+    OnlineCovariance of the outputs
+    """
+    acc = OnlineCovariance(len(explist))
+    for batch in output_batches(explist, chunksize):
+        acc.update(batch)
+    return acc
+
 def calculate_covariance(explist):
     """
     calculate covariance matrix for a structure
@@ -65,19 +131,12 @@ def calculate_covariance(explist):
     explist: list of equally queried sobol experiments from different simulators
     return;
     covariance matrix
+    each element is the variance of the two centered outputs pooled together,
+    (ss_i + ss_j)/(n_i + n_j - 1) where ss is the sum of squared deviations
     """
-    N = len(explist)
-    covariance_matrix = np.zeros((N,N), dtype = float)
-    for i in range(N):
-        # read observations
-        y1 = np.array(explist[i]['xy'])[:,-1]
-        # center
-        y1 = y1-np.mean(y1)
-        for j in range(N):
-            y2 = np.array(explist[j]['xy'])[:,-1]
-            y2 = y2-np.mean(y2)
-            covariance_matrix[i,j] = np.cov(np.hstack((y1,y2)), rowvar=False)
-    return covariance_matrix
+    acc = covariance_correlation(explist)
+    ss = np.diag(acc.M2)
+    return (ss[:,None] + ss[None,:])/(2*acc.n - 1)
 
 def calculate_correlation(explist):
     """
@@ -87,18 +146,7 @@ def calculate_correlation(explist):
     return;
     correlation matrix
     """
-    N = len(explist)
-    corr_matrix = np.zeros((N,N), dtype = float)
-    for i in range(N):
-        # read observations
-        y1 = np.array(explist[i]['xy'])[:,-1]
-        # center
-        y1 = y1-np.mean(y1)
-        for j in range(N):
-            y2 = np.array(explist[j]['xy'])[:,-1]
-            y2 = y2-np.mean(y2)
-            corr_matrix[i,j] = np.corrcoef(y1,y2, rowvar= False)[0,1]
-    return corr_matrix
+    return covariance_correlation(explist).correlation()
 
 def plot_y_scatter_trellis(explist, figname):
     # plot scatter plot trellis of sobol queue experiment y observations
@@ -212,21 +260,29 @@ def timings_plot_table(figname, folders):
 
     return lines
 
-def nearest_neighbour(x, sample):
-        """
-        find point (x') nearest to (x) in set of coordinates (sample),
-        calculate distance and return this distance |x-x'|
-        """
-        diff = lambda a, b: a-b
-        limit = lambda a: a if a <= 180 else 360-a
-        euc = lambda S: [np.sqrt(sum([limit(d)**2 for d in D])) for D in S]
-        dist = np.sort(euc(diff(x, sample)))
-        dist = dist[dist != 0] # strip identical points (0 distances)
-        return dist[0]
-
-def plot_TL_initialization_strategies(filename, folders):
+def periodic(sample, period = 360):
+    """
+    return coordinates wrapped to [0, period)
+    """
+    sample = np.mod(np.asarray(sample, dtype = float), period)
+    sample[sample >= period] = 0 # mod of tiny negative values rounds to period
+    return sample
+
+def nearest_neighbour_distances(sample, period = 360):
+    """
+    return distance from each point of sample to its nearest neighbour,
+    coordinates are periodic (dihedral angles), identical points are not neighbours
+    """
+    sample = periodic(sample, period)
+    unique, inverse = np.unique(sample, axis = 0, return_inverse = True)
+    tree = spatial.cKDTree(unique, boxsize = period)
+    dist, _ = tree.query(unique, k = 2)
+    return dist[np.reshape(inverse, -1), 1]
+
+def plot_TL_initialization_strategies(filename, folders, N = 50):
     """
     Compare TL initialization strategies
+    N: number of points to include, None includes all points
     plot:
     - scatter plots of acquisition locations - this is a great way to spot differences
     - histogram of nearest neighbour distances for these plots - to measure coverage and information value
@@ -249,18 +305,14 @@ def plot_TL_initialization_strategies(filename, folders):
                             sharex = 'row', sharey = 'row',
                         constrained_layout = True)
     titleadd  = ['random uniform', 'sobol', 'BO inorder', 'BO random']
-    N = 50 # how many points to include
     # loop through experiments
     for i in range(3):
         folder = folders[i]
         
-        dist = []
         exp = folder[0]
-        sample = np.array(exp['xy'])[:N,:-1]
-        outputs = np.array(exp['xy'])[:N,-1]
-        for x, y in zip(sample, outputs):
-            dist.append([nearest_neighbour(x, sample), y])
-        dist = np.array(dist).reshape(len(sample),2)
+        sample = np.asarray(exp['xy'])[:N,:-1]
+        outputs = np.asarray(exp['xy'])[:N,-1]
+        dist = np.column_stack((nearest_neighbour_distances(sample), outputs))
 
         # scatter plot of acuisitions
         ax = axs[0,i]
@@ -271,7 +323,8 @@ def plot_TL_initialization_strategies(filename, folders):
         ax.set_ylabel('x1')
         
         mean = np.mean(dist[:,0])
-        mode = sum(np.sort(dist[:,0])[int(N/2)-1:int(N/2)+1])/2
+        n = len(dist)
+        mode = sum(np.sort(dist[:,0])[int(n/2)-1:int(n/2)+1])/2
 
         # Histogram of nearest neighbour distances
         ax = axs[1,i]
@@ -303,18 +356,15 @@ def plot_TL_initialization_strategies(filename, folders):
     # (repeat the above for the random sample)
     folder = folders[2]
 
-    dist = []
     exp = folder[0]
-    obs = np.array(exp['xy'])
+    obs = np.asarray(exp['xy'])
     # bootstrap sample
     #idx = np.random.choice(np.arange(len(obs)), size = N, replace = False)
-    idx = np.random.choice(np.arange(len(obs)), size = N, replace = True)
+    idx = np.random.choice(np.arange(len(obs)), size = N or len(obs), replace = True)
     obs = obs[idx,:]
-    sample = np.array(obs)[:N,:-1]
-    outputs = np.array(obs)[:N,-1]
-    for x, y in zip(sample, outputs):
-        dist.append([nearest_neighbour(x, sample), y])
-    dist = np.array(dist).reshape(len(sample),2)
+    sample = obs[:,:-1]
+    outputs = obs[:,-1]
+    dist = np.column_stack((nearest_neighbour_distances(sample), outputs))
 
     sample = np.unique(sample, axis = 0)
     ax = axs[0,3]
@@ -361,13 +411,11 @@ def baseline_convergence_speed(figname, tablename, baselines, tolerance = 0.1):
     totaltimes = []
     names = []
     for i in range(N):
-        convergence_iters = []
-        convergence_time = []
-        # collect convergence iterations & cpu times
-        for exp in baselines[i]:
-            j = int(np.where(np.array(exp['tolerance_levels']) == tolerance)[0])
-            convergence_iters.append(exp['iterations_to_gmp_convergence'][j])
-            convergence_time.append(exp['totaltime_to_gmp_convergence'][j])
+        # collect convergence iterations & cpu times from the convergence summary
+        summary = convergence.folder_summary(baselines[i])
+        at_tolerance = summary['tolerances'] == tolerance
+        convergence_iters = list(summary['iterations'][at_tolerance])
+        convergence_time = list(summary['totaltime'][at_tolerance])
         # plot histograms
         for conv, ax in zip([convergence_iters, convergence_time], axs[:,i]):
             ax.hist(conv, color = 'blue', alpha = 0.5)
@@ -401,10 +449,10 @@ def baseline_convergence_speed(figname, tablename, baselines, tolerance = 0.1):
     lines = ['exp1 & median1 & exp2 & median2 & mw test statistic & p-value & critical value & equal medians\\\\']
     for i in range(N):
         for j in range(i+1, N):
-            ksw_test = kruskal(convergences[i], convergences[j])
+            ksw_test = stats.kruskal(convergences[i], convergences[j])
             g = 2
             deg_free = g-1
-            critical_value = chi2.ppf(ksw_test.pvalue, deg_free)
+            critical_value = stats.chi2.ppf(ksw_test.pvalue, deg_free)
             accepted = 'yes'
             if ksw_test.statistic > critical_value:
                 accepted = 'no'
@@ -0,0 +1,101 @@
+"""
+streaming statistics of per iteration trajectories over runs,
+e.g. a hyperparameter or an element of B at each BO iteration
+
+runs are added one at a time and aligned by BO iteration, runs may have
+different lengths, the statistics of an iteration are over the runs
+that reached it, memory is constant per iteration
+"""
+
+import numpy as np
+
+class TrajectoryStats:
+    """
+    count, mean, variance, min and max of values at each iteration,
+    updated with Welford's algorithm, nan values are skipped
+    """
+    def __init__(self):
+        self.count = np.zeros(0, dtype = int)
+        self.mean = np.zeros(0)
+        self.M2 = np.zeros(0) # sums of squared deviations
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+
+    def grow(self, N):
+        """
+        extend the statistics to N iterations
+        """
+        n = N - len(self.count)
+        if n <= 0:
+            return
+        self.count = np.append(self.count, np.zeros(n, dtype = int))
+        self.mean = np.append(self.mean, np.zeros(n))
+        self.M2 = np.append(self.M2, np.zeros(n))
+        self.min = np.append(self.min, np.full(n, np.inf))
+        self.max = np.append(self.max, np.full(n, -np.inf))
+
+    def update(self, values):
+        """
+        add trajectory of one run, values: value at each iteration
+        """
+        values = np.asarray(values, dtype = float).reshape(-1)
+        self.grow(len(values))
+        idx = np.flatnonzero(~np.isnan(values))
+        values = values[idx]
+        self.count[idx] += 1
+        delta = values - self.mean[idx]
+        self.mean[idx] += delta/self.count[idx]
+        self.M2[idx] += delta*(values - self.mean[idx])
+        self.min[idx] = np.minimum(self.min[idx], values)
+        self.max[idx] = np.maximum(self.max[idx], values)
+
+    def merge(self, other):
+        """
+        add statistics of other runs, e.g. computed in another process
+        """
+        self.grow(len(other.count))
+        N = len(other.count)
+        n_a, n_b = self.count[:N], other.count
+        n = n_a + n_b
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            delta = other.mean - self.mean[:N]
+            self.mean[:N] = np.where(n > 0, self.mean[:N] + delta*n_b/n, 0)
+            self.M2[:N] = np.where(n > 0, self.M2[:N] + other.M2 + delta**2*n_a*n_b/n, 0)
+        self.count[:N] = n
+        self.min[:N] = np.minimum(self.min[:N], other.min)
+        self.max[:N] = np.maximum(self.max[:N], other.max)
+
+    def variance(self, ddof = 0):
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            return self.M2/(self.count - ddof)
+
+    def std(self, ddof = 0):
+        return np.sqrt(self.variance(ddof))
+
+    def bands(self):
+        """
+        return mean, sd, min and max at each iteration
+        """
+        return self.mean.copy(), self.std(), self.min.copy(), self.max.copy()
+
+def run_values(run, variable, idx, use_abs = False):
+    """
+    return values of a variable of a run at each iteration,
+    matrices of an iteration (e.g. B) are indexed as flattened rows
+    """
+    values = np.asarray(run[variable], dtype = float)
+    if values.size == 0:
+        return values.reshape(-1)
+    values = np.atleast_2d(values)
+    values = values.reshape((len(values), -1))[:,idx]
+    return np.abs(values) if use_abs else values
+
+def aggregate(runs, variable, idx, use_abs = False):
+    """
+    return TrajectoryStats of a variable over runs,
+    runs can be any iterable of run dicts, e.g. a generator
+    """
+    stats = TrajectoryStats()
+    for run in runs:
+        stats.update(run_values(run, variable, idx, use_abs))
+    return stats
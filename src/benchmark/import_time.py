@@ -0,0 +1,77 @@
+"""
+measure import time of the Snakefile header and of the src modules,
+each in a fresh interpreter, and check them against a time budget
+
+the Snakefile header is its top level import and lazy.module lines,
+it should not import the heavy modules, which are imported by the rules
+that use them
+
+run from the repository root:
+python3 -m src.benchmark.import_time [budget in seconds]
+"""
+
+import re
+import subprocess
+import sys
+
+# should not be imported when the Snakefile is parsed
+HEAVY = ('pandas', 'matplotlib', 'scipy', 'sklearn')
+
+MODULES = ('src.io.readwrite', 'src.io.repository', 'src.profiling.profiler',
+           'src.parse.pipeline', 'src.analyse.sumstat', 'src.plot.plot_convergence',
+           'src.plot.plot_TL_results', 'src.plot.plot_hyperparam_prior_results',
+           'src.plot.render')
+
+TIMER = """
+import sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(' '.join(name for name in {heavy} if name in sys.modules))
+"""
+
+def snakefile_header(filepath = 'Snakefile'):
+    """
+    return top level import and lazy module lines of the Snakefile
+    """
+    with open(filepath, 'r') as f:
+        return [line for line in f
+                if re.match(r'(import |from \S+ import )', line) or 'lazy.module(' in line]
+
+def time_import(code, cwd = None):
+    """
+    return wall time of code in a fresh interpreter and the heavy modules it imported
+    cwd: directory the interpreter is run in, the repository root
+    """
+    res = subprocess.run([sys.executable, '-c', TIMER.format(code = code, heavy = HEAVY)],
+                        stdout = subprocess.PIPE, universal_newlines = True, check = True,
+                        cwd = cwd)
+    lines = res.stdout.splitlines()
+    return float(lines[-2]), lines[-1].split()
+
+def main(budget = 1.0, repeats = 3):
+    """
+    print import times, return true if the Snakefile header is within budget
+    and does not import heavy modules
+    """
+    print('module & import time (s) & heavy modules \\\\')
+    for name in MODULES:
+        seconds, heavy = min(time_import(f'import {name}') for _ in range(repeats))
+        print(f"{name} & {seconds:.3f} & {' '.join(heavy)} \\\\")
+    header = ''.join(snakefile_header())
+    seconds, heavy = min(time_import(header) for _ in range(repeats))
+    print(f"Snakefile & {seconds:.3f} & {' '.join(heavy)} \\\\")
+    ok = True
+    if seconds > budget:
+        print(f'Snakefile imports take {seconds:.3f} s, budget {budget} s')
+        ok = False
+    if heavy:
+        print(f"Snakefile imports heavy modules: {' '.join(heavy)}")
+        ok = False
+    return ok
+
+if __name__=='__main__':
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    if not main(budget):
+        sys.exit(1)
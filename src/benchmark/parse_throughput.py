@@ -0,0 +1,72 @@
+"""
+measure boss.out parsing throughput (MB/s) on synthetic files
+and compare to the previous readlines parser (REFERENCE_COMMIT)
+
+run from the repository root:
+python3 -m src.benchmark.parse_throughput [n_lines ...]
+"""
+
+import contextlib
+import io
+import numpy as np
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import src.parse.parse_BOSS_output as parse
+import src.benchmark.synthetic_bossout as synthetic
+
+# the readlines parser that the streaming parser replaced, read from git
+# so that the reference is not kept as a copy
+REFERENCE_COMMIT = '019cf37f1c756d3a9a540e62b150fb7061b7b5bc'
+REFERENCE_FILE = 'src/parse/parse_BOSS_output.py'
+
+def reference_parser(commit = REFERENCE_COMMIT):
+    """
+    return read_bossout of the parser at a git commit
+    """
+    res = subprocess.run(['git', 'show', f'{commit}:{REFERENCE_FILE}'],
+                        stdout = subprocess.PIPE, universal_newlines = True, check = True)
+    module = types.ModuleType('reference_parser')
+    exec(compile(res.stdout, f'{commit}:{REFERENCE_FILE}', 'exec'), module.__dict__)
+    return module.read_bossout
+
+def _as_lists(data):
+    return {key: (val.tolist() if isinstance(val, np.ndarray) else val)
+            for key, val in data.items()}
+
+def time_parser(reader, path, filename, repeats = 3):
+    """
+    return best wall time of repeats and the parsed dict
+    """
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        res = reader(path, filename, 'benchmark')
+        elapsed = time.perf_counter()-start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, res
+
+def main(line_counts, repeats = 3):
+    reference = reference_parser()
+    print('lines & MB & readlines MB/s & streaming MB/s & speedup \\\\')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f'{tmp}/'
+        for n_lines in line_counts:
+            synthetic.write(f'{path}boss.out', n_lines)
+            megabytes = os.path.getsize(f'{path}boss.out')/1e6
+            with contextlib.redirect_stdout(io.StringIO()): # the parsers print the path
+                t_ref, ref = time_parser(reference, path, 'boss.out', repeats)
+                t_new, new = time_parser(parse.read_bossout, path, 'boss.out', repeats)
+            if _as_lists(new) != ref:
+                raise ValueError(f'parsers disagree on {n_lines} lines')
+            print(f'{n_lines} & {megabytes:.1f} & {megabytes/t_ref:.1f} & ' + \
+                  f'{megabytes/t_new:.1f} & {t_ref/t_new:.2f} \\\\')
+
+if __name__=='__main__':
+    args = sys.argv[1:]
+    line_counts = [int(arg) for arg in args] if args else [10000, 100000, 1000000]
+    main(line_counts)
@@ -0,0 +1,145 @@
+"""
+parser benchmark suite, times parse, preprocess and save of synthetic
+boss.out files, per file and per MB of boss.out
+
+results are recorded to a baseline file and later runs are checked
+against it, a stage that is threshold times slower than the baseline
+is a regression if it is also at least min_difference seconds slower,
+each timing repeats the stage until at least min_seconds have passed
+
+run from the repository root:
+python3 -m src.benchmark.suite [record] [config file]
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import src.io.readwrite as rw
+import src.parse.parse_BOSS_output as parse
+import src.parse.preprocess as preprocess
+import src.benchmark.synthetic_bossout as synthetic
+
+STAGES = ('parse', 'preprocess', 'save')
+
+def case_name(case):
+    """
+    return name of a benchmark case, e.g. 2D_1tasks_100iterpts
+    """
+    return f"{case['dim']}D_{case['tasks']}tasks_{case['iterpts']}iterpts"
+
+def best_time(function, repeats, min_seconds = 0.1):
+    """
+    return best wall time per call of repeats and the result of the last call,
+    each repeat calls function until at least min_seconds have passed
+    """
+    best = None
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            res = function()
+            calls += 1
+            elapsed = time.perf_counter()-start
+            if elapsed >= min_seconds:
+                break
+        if best is None or elapsed/calls < best:
+            best = elapsed/calls
+    return best, res
+
+def run_case(case, path, repeats = 3, tolerance_levels = [0], min_seconds = 0.1):
+    """
+    time the stages of one case
+    returns dict of file size in MB, seconds per file and MB/s of each stage
+    """
+    synthetic.write(f'{path}boss.out', dim = case['dim'], tasks = case['tasks'],
+                    iterpts = case['iterpts'], initpts = case['initpts'])
+    megabytes = os.path.getsize(f'{path}boss.out')/1e6
+    with contextlib.redirect_stdout(io.StringIO()): # the parser prints the path
+        t_parse, parsed = best_time(lambda: parse.read_bossout(path, 'boss.out', 'benchmark'),
+                                    repeats, min_seconds)
+    # preprocessing starts from the parsed json, as in the pipeline
+    preprocess.add_raw_layer(parsed)
+    text = json.dumps(parsed, default = rw.tolist)
+    bestacq = preprocess.get_bestacq(parsed).tolist()
+    def preprocess_run():
+        data = json.loads(text)
+        data['truemin'] = [bestacq]*data['tasks']
+        return preprocess.preprocess(data, tolerance_levels)
+    t_preprocess, data = best_time(preprocess_run, repeats, min_seconds)
+    t_save, _ = best_time(lambda: rw.save_json(data, path, 'benchmark.json'),
+                          repeats, min_seconds)
+    ret = {'megabytes': megabytes}
+    for stage, seconds in zip(STAGES, (t_parse, t_preprocess, t_save)):
+        ret[f'{stage}_seconds'] = seconds
+        ret[f'{stage}_MBps'] = megabytes/seconds
+    return ret
+
+def run(cases, repeats = 3, tolerance_levels = [0], min_seconds = 0.1):
+    """
+    return results of each case keyed by case name
+    """
+    ret = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for case in cases:
+            ret[case_name(case)] = run_case(case, f'{tmp}/', repeats, tolerance_levels,
+                                             min_seconds)
+    return ret
+
+def regressions(results, baseline, threshold = 1.5, min_difference = 0.01):
+    """
+    return list of (case, stage, seconds, baseline seconds) of the stages
+    that are threshold times and min_difference seconds slower than the baseline,
+    cases missing from the baseline are not checked
+    """
+    ret = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for stage in STAGES:
+            seconds = result[f'{stage}_seconds']
+            reference = baseline[name][f'{stage}_seconds']
+            if seconds > threshold*reference and seconds-reference > min_difference:
+                ret.append((name, stage, seconds, reference))
+    return ret
+
+def print_results(results):
+    print('case & MB & ' + ' & '.join(f'{stage} s & {stage} MB/s' for stage in STAGES) + ' \\\\')
+    for name, result in results.items():
+        values = ' & '.join(f"{result[f'{stage}_seconds']:.4f} & {result[f'{stage}_MBps']:.1f}"
+                            for stage in STAGES)
+        print(f"{name} & {result['megabytes']:.2f} & {values} \\\\")
+
+def main(config, record = False):
+    """
+    run the suite, record the results to the baseline file or check them against it
+    returns list of regressions
+    """
+    results = run(config['cases'], config['repeats'], config['tolerance_levels'],
+                  config.get('min_seconds', 0.1))
+    print_results(results)
+    filepath = config['baseline']
+    path, filename = os.path.split(filepath)
+    path = os.path.join(path, '') # '' or with trailing separator
+    if record or not os.path.exists(filepath):
+        os.makedirs(path or '.', exist_ok = True)
+        rw.save_json(results, path, filename)
+        print(f'Recorded baseline: {filepath}')
+        return []
+    found = regressions(results, rw.load_json(path, filename), config['threshold'],
+                        config.get('min_difference', 0.01))
+    for name, stage, seconds, reference in found:
+        print(f'Regression: {name} {stage} {seconds:.4f} s, baseline {reference:.4f} s')
+    return found
+
+if __name__=='__main__':
+    args = sys.argv[1:]
+    record = 'record' in args
+    args = [arg for arg in args if arg != 'record']
+    config = rw.load_yaml('', args[0]) if args else \
+             rw.load_yaml('src/config/benchmark/', 'suite.yaml')
+    if main(config, record):
+        sys.exit(1)
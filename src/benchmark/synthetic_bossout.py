@@ -0,0 +1,123 @@
+"""
+write synthetic boss.out files in the format of BOSS 0.9.x,
+the real raw data is not in the repository
+"""
+
+import numpy as np
+import sys
+
+RULER = '-'*80 + '\n'
+
+def _values(row):
+    return '  ' + '  '.join('{: .10E}'.format(val) for val in row) + '\n'
+
+def _title(title):
+    return [RULER, f'{title:^80}\n', RULER]
+
+def header(dim, tasks, initpts, iterpts):
+    """
+    return banner, echo of the input file and simulation options
+    """
+    bounds = '; '.join(['-50 310']*dim)
+    lines = _title('Welcome to ....')
+    lines += ['\n', '| Reading BOSS input file from: boss.in\n', '| Initializing...\n', '\n']
+    lines += _title('INPUT FILE')
+    lines += ['# synthetic input file\n', '\n', '# optimization\n',
+              'userfn       userfn.py\n',
+              f'bounds       {bounds}\n']
+    if tasks > 1:
+        lines.append(f'num_tasks    {tasks}\n')
+    lines += ['kernel       stdp\n',
+              'yrange       -10 10\n',
+              'initpts      ' + ' '.join(str(n) for n in initpts) + '\n',
+              f'iterpts      {iterpts}\n',
+              'verbosity    2\n', '\n',
+              'thetaprior gamma\n',
+              'thetapriorparam 2 0.019; 3.3678 9.0204; 3.3678 9.0204\n', '\n']
+    lines += _title('SIMULATION OPTIONS')
+    lines += ['|| Key settings \n',
+              'initpts   ' + ' '.join(str(n) for n in initpts) + f'    iterpts   {iterpts}\n',
+              '\n', '|| GP hyperparameters \n',
+              'thetainit       1.000E+01 3.142E-01\n',
+              'thetabounds     none\n', '\n', '\n']
+    return lines
+
+def iteration(title, x, y, best, gmp, convergence, hyperparam, acqtime, totaltime):
+    """
+    return lines of one BO iteration
+    """
+    lines = _title(title)
+    lines += ['| Evaluating objective function at x = ' + ' '.join('{:.3E}'.format(val) for val in x) + '\n',
+              '| Objective function evaluated, time [s]  {:>11.3f}\n'.format(acqtime),
+              '| Data point added to dataset (x y): \n', _values(np.append(x, y)), '\n',
+              '| Total ensemble size: 1\n']
+    if best is not None:
+        lines += ['| Best acquisition, x_best y_best:\n', _values(best),
+                  '| Global minimum prediction, x_hat mu_hat +- nu_hat:\n', _values(gmp),
+                  '| Global minimum convergence, dx_hat dmu_hat:\n', _values(convergence), '\n',
+                  '| GP model hyperparameters (lengthscales variance):\n', _values(hyperparam)]
+    lines += ['| Next sampling location x_next:\n', _values(x), '\n',
+              'Iteration time [s]:  {:>7.3f}        Total time [s]:  {:>7.3f}\n'.format(acqtime, totaltime),
+              '\n']
+    return lines
+
+def generate(dim = 2, tasks = 1, iterpts = 100, initpts = 2, seed = 0):
+    """
+    return lines of a synthetic boss.out
+    dim: search space dimension
+    tasks: number of tasks, task index is added to x when > 1
+    iterpts: number of BO iterations
+    initpts: number of initial points
+    """
+    rng = np.random.RandomState(seed)
+    # lengthscales and variance, or lengthscales, W and kappa
+    n_params = dim + 1 if tasks == 1 else dim + 2*tasks
+    initlist = [initpts] if tasks == 1 else [initpts, 0]
+    lines = header(dim, tasks, initlist, iterpts)
+    totaltime = 0.
+    best = None
+    for i in range(initpts + iterpts):
+        x = rng.uniform(-50, 310, dim)
+        if tasks > 1: # initial data is spread over the tasks
+            x = np.append(x, i % tasks if i < initpts else 0)
+        y = rng.normal(30, 5)
+        acqtime = rng.uniform(0.5, 20)
+        totaltime += acqtime
+        if best is None or y < best[-1]:
+            best = np.append(x, y)
+        gmp = np.append(best, rng.uniform(0, 1))
+        convergence = rng.uniform(0, 1, 2)
+        hyperparam = rng.uniform(0, 10, n_params)
+        if i < initpts:
+            title = f'INITIAL DATAPOINT {i+1}'
+        else:
+            title = f'ITERATION {i-initpts+1}'
+        lines += iteration(title, x, y, best if i > 0 else None,
+                    gmp, convergence, hyperparam, acqtime, totaltime)
+    return lines
+
+def iterations_for_lines(n_lines, dim = 2, tasks = 1, initpts = 2):
+    """
+    return number of BO iterations that gives approximately n_lines lines
+    """
+    per_iteration = len(generate(dim, tasks, 1, initpts)) - len(generate(dim, tasks, 0, initpts))
+    fixed = len(generate(dim, tasks, 0, initpts))
+    return max(0, int(round((n_lines - fixed)/per_iteration)))
+
+def write(filepath, n_lines = None, dim = 2, tasks = 1, iterpts = 100, initpts = 2, seed = 0):
+    """
+    write synthetic boss.out, if n_lines is given, iterpts is chosen to match it
+    """
+    if n_lines is not None:
+        iterpts = iterations_for_lines(n_lines, dim, tasks, initpts)
+    with open(filepath, 'w') as f:
+        f.writelines(generate(dim, tasks, iterpts, initpts, seed))
+
+if __name__=='__main__':
+    # synthetic_bossout.py filepath n_lines [dim] [tasks]
+    args = sys.argv[1:]
+    filepath = args[0]
+    n_lines = int(args[1])
+    dim = int(args[2]) if len(args) > 2 else 2
+    tasks = int(args[3]) if len(args) > 3 else 1
+    write(filepath, n_lines, dim, tasks)
@@ -0,0 +1,155 @@
+"""
+sqlite index of processed runs, for finding runs by their settings and
+convergence without loading the observations
+
+table runs: one row per run
+    folder, run, name, dim, tasks, num_tasks, initpts (primary),
+    secondary_initpts, iterpts, kernel, thetapriorparam (json),
+    observations, totaltime (final)
+table convergence: one row per run and tolerance level
+    folder, run, tolerance, iterations, totaltime, observations
+    (to gmp convergence, null if not converged)
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import src.io.readwrite as rw
+
+INDEX = 'index.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    folder TEXT, run TEXT, name TEXT, dim INTEGER, tasks INTEGER,
+    num_tasks INTEGER, initpts INTEGER, secondary_initpts INTEGER,
+    iterpts INTEGER, kernel TEXT, thetapriorparam TEXT,
+    observations INTEGER, totaltime REAL,
+    PRIMARY KEY (folder, run));
+CREATE TABLE IF NOT EXISTS convergence (
+    folder TEXT, run TEXT, tolerance REAL, iterations INTEGER,
+    totaltime REAL, observations INTEGER,
+    PRIMARY KEY (folder, run, tolerance));
+CREATE INDEX IF NOT EXISTS runs_settings ON runs (tasks, dim, secondary_initpts);
+"""
+
+def first(value):
+    """
+    return first item of a parsed list value, or the value itself
+    """
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+def run_rows(folder, run, data):
+    """
+    return row of table runs and rows of table convergence for a run dict
+    """
+    initpts = list(data.get('initpts', [])) + [0, 0]
+    totaltime = data.get('totaltime')
+    row = (folder, run, data.get('name'), data.get('dim'), data.get('tasks'),
+           data.get('num_tasks'), initpts[0], initpts[1],
+           first(data.get('iterpts')), first(data.get('kernel')),
+           json.dumps(data.get('thetapriorparam')),
+           len(data['xy']) if data.get('xy') is not None else None,
+           float(totaltime[-1]) if totaltime is not None and len(totaltime) > 0 else None)
+    convergence = []
+    for i, tolerance in enumerate(data.get('tolerance_levels', [])):
+        values = [data[f'{key}_to_gmp_convergence'][i]
+                  for key in ('iterations', 'totaltime', 'observations')]
+        values = [None if val is None or val != val else val for val in values] # nan to null
+        convergence.append((folder, run, tolerance,
+                            None if values[0] is None else int(values[0]),
+                            None if values[1] is None else float(values[1]),
+                            None if values[2] is None else int(values[2])))
+    return row, convergence
+
+def connect(path = 'processed_data/', filename = INDEX):
+    """
+    open the index, the tables are created if they do not exist
+    """
+    connection = sqlite3.connect(f'{path}{filename}')
+    connection.executescript(SCHEMA)
+    return connection
+
+def update(rows, path = 'processed_data/', filename = INDEX):
+    """
+    insert or replace rows of runs
+    rows: list of run_rows results
+    """
+    connection = connect(path, filename)
+    with connection:
+        for row, convergence in rows:
+            connection.execute('DELETE FROM convergence WHERE folder = ? AND run = ?', row[:2])
+            connection.execute(f'INSERT OR REPLACE INTO runs VALUES ({",".join("?"*len(row))})', row)
+            connection.executemany('INSERT INTO convergence VALUES (?,?,?,?,?,?)', convergence)
+    connection.close()
+
+def build(parsed_dict, path = 'processed_data/', filename = INDEX):
+    """
+    index all runs of processed data
+    parsed_dict: experiment folder -> list of run names
+    """
+    rows = []
+    for folder, runs in parsed_dict.items():
+        for run in runs:
+            data = rw.load_json(f'{path}{folder}/', f'{run}.json')
+            rows.append(run_rows(folder, run, data))
+    update(rows, path, filename)
+
+TABLES = ('runs', 'convergence')
+
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=')
+
+def conditions(where, columns):
+    """
+    return sql condition with ? placeholders and its values
+    where: dict of column -> value or (operator, value), None matches null
+    columns: columns of the table
+    """
+    terms = []
+    params = []
+    for column, value in where.items():
+        if column not in columns:
+            raise ValueError(f"unknown column {column}")
+        operator, value = value if isinstance(value, tuple) else ('=', value)
+        if operator not in OPERATORS:
+            raise ValueError(f"unknown operator {operator}")
+        if value is None:
+            if operator not in ('=', '!='):
+                raise ValueError(f"null can not be compared with {operator}")
+            terms.append(f'{column} IS NULL' if operator == '=' else f'{column} IS NOT NULL')
+        else:
+            terms.append(f'{column} {operator} ?')
+            params.append(value)
+    return ' AND '.join(terms), tuple(params)
+
+def query(where = None, table = 'runs', path = 'processed_data/', filename = INDEX):
+    """
+    return rows of the index as dicts
+    where: dict of conditions, column -> value or (operator, value),
+        e.g. {'tasks': 2, 'dim': 4, 'secondary_initpts': ('>=', 20)}
+    table: runs or convergence
+    the index is opened read-only, it is not created by a query
+    """
+    if table not in TABLES:
+        raise ValueError(f"unknown table {table}")
+    if not os.path.exists(f'{path}{filename}'):
+        raise FileNotFoundError(f'{path}{filename} does not exist, '
+                                f'build it with python -m src.io.index {path}')
+    connection = sqlite3.connect(f'file:{path}{filename}?mode=ro', uri = True)
+    connection.row_factory = sqlite3.Row
+    columns = [row['name'] for row in connection.execute(f'PRAGMA table_info({table})')]
+    sql = f'SELECT * FROM {table}'
+    params = ()
+    if where:
+        condition, params = conditions(where, columns)
+        sql = f'{sql} WHERE {condition}'
+    rows = [dict(row) for row in connection.execute(sql, params)]
+    connection.close()
+    return rows
+
+if __name__=='__main__':
+    # python -m src.io.index [processed data path]
+    path = sys.argv[1] if len(sys.argv) > 1 else 'processed_data/'
+    build(rw.load_json(path, 'parsed_dict.json'), path)
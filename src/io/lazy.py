@@ -0,0 +1,48 @@
+"""
+lazily imported modules, for cutting the startup time of the Snakefile
+and the scripts
+
+pd = lazy.module('pandas')
+the module is imported on the first attribute access, e.g. pd.concat,
+so modules that are only used by some rules or functions are not imported
+when the Snakefile is parsed or for the other rules
+"""
+
+import importlib
+import sys
+import types
+
+class LazyModule(types.ModuleType):
+    """
+    module proxy that imports the module on first attribute access
+    """
+    def __init__(self, name):
+        super().__init__(name)
+        self.__module = None
+
+    def load(self):
+        """
+        return the imported module
+        """
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name__)
+        return self.__module
+
+    def __getattr__(self, attr):
+        # called only for attributes the proxy itself does not have
+        return getattr(self.load(), attr)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self):
+        state = 'imported' if self.__module is not None else 'not imported'
+        return f'<lazy module {self.__name__!r} ({state})>'
+
+def module(name):
+    """
+    return the module if it is already imported, otherwise a LazyModule
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
@@ -1,5 +1,11 @@
+import hashlib
 import json
+import numpy as np
+import os
+import struct
 import yaml
+import zipfile
+from collections.abc import MutableMapping
 
 def load_json(path, filename):
     """
@@ -10,12 +16,339 @@ def load_json(path, filename):
         return data
     raise FileNotFoundError(f'{path}{filename} could not be loaded with json.load')
 
-def save_json(data, path, filename):
+def tolist(value):
+    """
+    json default for numpy arrays and numbers
+    """
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def save_json(data, path, filename, index = False):
     """
     save json file
+    index: also write the sidecar index of LazyRun, the byte spans of the
+        values are known when the values are written, so a lazy load of
+        the file does not have to decode it to find them
+    """
+    filepath = f'{path}{filename}'
+    if not index:
+        with open(filepath, 'w') as f:
+            json.dump(data, f, default = tolist)
+        return
+    # same text as json.dump, ascii only so characters are bytes
+    items = []
+    spans = {}
+    offset = 1
+    for key, value in data.items():
+        head = f'{json.dumps(key)}: '
+        text = json.dumps(value, default = tolist)
+        spans[key] = (offset + len(head), offset + len(head) + len(text))
+        items.append(head + text)
+        offset += len(head) + len(text) + len(', ')
+    with open(filepath, 'w') as f:
+        f.write('{' + ', '.join(items) + '}')
+    save_index(filepath, spans)
+
+def save_index(filepath, spans, validate = 'mtime'):
+    """
+    write sidecar index {filepath}.idx of the value spans of a json file,
+    the index is valid while the signature of the file is unchanged
+    """
+    signature = json.loads(json.dumps(file_signature(filepath, validate))) # as stored
+    try:
+        with open(f'{filepath}.idx', 'w') as f:
+            json.dump({'signature': signature, 'spans': list(spans.items())}, f)
+    except OSError: # read-only folder, the index is rebuilt next time
+        pass
+
+def file_signature(filepath, validate = 'mtime'):
+    """
+    return signature of a file, changes when the file changes
+    validate: 'mtime' modification time and size, 'hash' sha1 of the content
+    """
+    if validate == 'hash':
+        sha = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        return sha.hexdigest()
+    if validate != 'mtime':
+        raise ValueError("unknown validate")
+    stat = os.stat(filepath)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def json_key_spans(filepath):
+    """
+    return byte spans (begin, end) of the values of a json object by key
+    """
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    text = raw.decode('utf-8')
+    decoder = json.JSONDecoder()
+    whitespace = ' \t\n\r'
+    spans = {}
+    i = text.index('{') + 1
+    while True:
+        while text[i] in whitespace:
+            i += 1
+        if text[i] == '}':
+            break
+        if text[i] == ',':
+            i += 1
+            continue
+        key, i = decoder.raw_decode(text, i)
+        i = text.index(':', i) + 1
+        while text[i] in whitespace:
+            i += 1
+        _, end = decoder.raw_decode(text, i)
+        spans[key] = (i, end)
+        i = end
+    if len(raw) != len(text): # character to byte offsets
+        spans = {key: (len(text[:begin].encode()), len(text[:end].encode()))
+                 for key, (begin, end) in spans.items()}
+    return spans
+
+class LazyRun(MutableMapping):
+    """
+    run dict of a json file, which decodes each value on first access
+    the byte spans of the values are read from a sidecar index {filename}.idx
+    (not tracked by git), written by save_json(..., index = True) or built
+    by decoding the file once, it is rebuilt when the signature of the file
+    changes, see file_signature
+    assigned and deleted keys are kept in memory, the file is not modified
+    """
+    def __init__(self, path, filename, validate = 'mtime'):
+        self.filepath = f'{path}{filename}'
+        self.validate = validate
+        self.decoded = {} # values decoded from the file, shared by copies
+        self.cache = {} # assigned values
+        self.spans = self.load_spans()
+        self.order = list(self.spans)
+
+    def load_spans(self):
+        # as stored in the json index
+        signature = json.loads(json.dumps(file_signature(self.filepath, self.validate)))
+        indexpath = f'{self.filepath}.idx'
+        try:
+            with open(indexpath, 'r') as f:
+                index = json.load(f)
+            if index['signature'] == signature:
+                return {key: tuple(span) for key, span in index['spans']}
+        except (OSError, ValueError, KeyError):
+            pass
+        # without a valid index the whole file is decoded once to find the spans
+        spans = json_key_spans(self.filepath)
+        save_index(self.filepath, spans, self.validate)
+        return spans
+
+    def __getitem__(self, key):
+        if key in self.cache:
+            return self.cache[key]
+        if key not in self.spans:
+            raise KeyError(key)
+        if key not in self.decoded:
+            begin, end = self.spans[key]
+            with open(self.filepath, 'rb') as f:
+                f.seek(begin)
+                self.decoded[key] = json.loads(f.read(end - begin).decode('utf-8'))
+        return self.decoded[key]
+
+    def __setitem__(self, key, value):
+        if key not in self.cache and key not in self.spans:
+            self.order.append(key)
+        self.cache[key] = value
+
+    def __delitem__(self, key):
+        if key not in self.cache and key not in self.spans:
+            raise KeyError(key)
+        self.cache.pop(key, None)
+        self.spans.pop(key, None)
+        self.order.remove(key)
+
+    def __contains__(self, key):
+        return key in self.cache or key in self.spans
+
+    def __iter__(self):
+        return iter(list(self.order))
+
+    def __len__(self):
+        return len(self.order)
+
+    def copy(self):
+        """
+        return shallow copy, the decoded values are shared
+        """
+        ret = LazyRun.__new__(LazyRun)
+        ret.filepath = self.filepath
+        ret.validate = self.validate
+        ret.decoded = self.decoded
+        ret.cache = dict(self.cache)
+        ret.spans = dict(self.spans)
+        ret.order = list(self.order)
+        return ret
+
+    def __repr__(self):
+        return f'LazyRun({self.filepath!r})'
+
+def load_json_lazy(path, filename, validate = 'mtime'):
+    """
+    load json file as LazyRun, values are decoded on first access
+    """
+    return LazyRun(path, filename, validate)
+
+# per iteration fields of a run, stored as columns of a folder
+COLUMNS = ('xy', 'acqtime', 'bestacq', 'gmp', 'gmp_convergence',
+        'GP_hyperparam', 'itertime', 'totaltime', 'modeltime', 'B',
+        'iterations_to_gmp_convergence', 'totaltime_to_gmp_convergence',
+        'observations_to_gmp_convergence',
+        'raw.xy', 'raw.gmp', 'raw.bestacq', 'raw.totaltime')
+
+# nested dicts of a run, their fields are stored as columns {layer}.{key}
+LAYERS = ('raw',)
+
+def flatten_layers(run):
+    """
+    return run with fields of the layers as {layer}.{key}
+    """
+    ret = {key: val for key, val in run.items() if key not in LAYERS}
+    for layer in LAYERS:
+        for key, val in run.get(layer, {}).items():
+            ret[f'{layer}.{key}'] = val
+    return ret
+
+def nest_layers(run):
+    """
+    return run with fields {layer}.{key} moved under the layers
+    """
+    ret = {}
+    for key, val in run.items():
+        layer, _, field = key.partition('.')
+        if layer in LAYERS and field:
+            ret.setdefault(layer, {})[field] = val
+        else:
+            ret[key] = val
+    return ret
+
+def save_columnar(runs, path, filename, run_names = None):
+    """
+    save runs of an experiment folder to one .npz file
+    each column is stored as the runs concatenated along the first axis
+    ({column}) and the row offsets of the runs ({column}_offsets),
+    other fields of the runs, missing values (None) and columns
+    which do not stack over the runs are stored as json in 'meta'
+    """
+    runs = [flatten_layers(run) for run in runs]
+    arrays = {}
+    meta = [{} for run in runs]
+    for column in COLUMNS:
+        if all(column not in run for run in runs):
+            continue
+        values = [None if run.get(column) is None else np.array(run[column], dtype = float)
+                    for run in runs]
+        present = [val for val in values if val is not None and val.size > 0]
+        shapes = set(val.shape[1:] for val in present)
+        if len(shapes) > 1: # runs do not stack, keep as json
+            for m, run in zip(meta, runs):
+                m[column] = run.get(column)
+            continue
+        rowshape = shapes.pop() if shapes else ()
+        offsets = [0]
+        for m, val in zip(meta, values):
+            if val is None:
+                m[column] = None
+            offsets.append(offsets[-1] + (0 if val is None else len(val)))
+        stack = [val.reshape((-1,)+rowshape) for val in values if val is not None]
+        arrays[column] = np.concatenate(stack) if stack else np.empty((0,)+rowshape)
+        arrays[f'{column}_offsets'] = np.array(offsets, dtype = np.int64)
+    for m, run in zip(meta, runs):
+        for key, val in run.items():
+            if key not in COLUMNS:
+                m[key] = val
+    if run_names is None:
+        run_names = [f'exp_{i+1}' for i in range(len(runs))]
+    arrays['runs'] = np.array(run_names)
+    arrays['meta'] = np.array(json.dumps(meta))
+    with open(f'{path}{filename}', 'wb') as f:
+        np.savez(f, **arrays)
+
+def member_memmap(filepath, info, mode = 'r'):
+    """
+    return memory map of an uncompressed .npy member of a .npz file,
+    or None if the member can not be mapped
+    """
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(filepath, 'rb') as f:
+        # local file header is 30 bytes followed by name and extra field
+        f.seek(info.header_offset)
+        header = f.read(30)
+        name_len, extra_len = struct.unpack('<2H', header[26:30])
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if dtype.hasobject or 0 in shape:
+        return None
+    return np.memmap(filepath, dtype = dtype, mode = mode, offset = offset,
+                shape = shape, order = 'F' if fortran_order else 'C')
+
+def load_columnar_arrays(path, filename, mmap_mode = None):
+    """
+    load whole folder arrays from a .npz file saved with save_columnar
+    return dict of column values, column offsets, 'runs' (names) and 'meta'
+    mmap_mode: if given ('r' or 'c'), columns are memory mapped from the file
+    instead of read to memory, see numpy.memmap
+    """
+    ret = {}
+    filepath = f'{path}{filename}'
+    if mmap_mode is not None:
+        with zipfile.ZipFile(filepath) as zf:
+            for info in zf.infolist():
+                key = info.filename[:-len('.npy')]
+                if key in ('runs', 'meta'):
+                    continue
+                array = member_memmap(filepath, info, mmap_mode)
+                if array is not None:
+                    ret[key] = array
+    with np.load(filepath, allow_pickle = False) as f:
+        for key in f.files:
+            if key not in ret:
+                ret[key] = f[key]
+    ret['runs'] = list(ret['runs'])
+    ret['meta'] = json.loads(str(ret['meta']))
+    return ret
+
+def split_runs(arrays, runs = None):
+    """
+    return per run dicts from whole folder arrays,
+    columns of the runs are views to the folder arrays
+    runs: names of the runs to return, defaults to all
+    """
+    if runs is None:
+        runs = arrays['runs']
+    ret = []
+    for name in runs:
+        i = arrays['runs'].index(name)
+        run = dict(arrays['meta'][i])
+        for column in COLUMNS:
+            if column in arrays and column not in run:
+                begin, end = arrays[f'{column}_offsets'][i:i+2]
+                run[column] = arrays[column][begin:end]
+        ret.append(nest_layers(run))
+    return ret
+
+def load_columnar(path, filename, runs = None, mmap_mode = None):
+    """
+    load runs of an experiment folder from a .npz file saved with save_columnar
+    return list of run dicts
+    runs: names of the runs to load, defaults to all
+    mmap_mode: if given, columns of the runs are views to memory mapped file
     """
-    with open(f'{path}{filename}', 'w') as f:
-        json.dump(data, f)
+    return split_runs(load_columnar_arrays(path, filename, mmap_mode), runs)
 
 def load_yaml(path, filename):
     """
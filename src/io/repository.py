@@ -0,0 +1,205 @@
+"""
+experiment repository, a process wide cache of processed runs
+
+runs are keyed by (folder, run name) and loaded from the columnar store
+processed_data/{folder}.npz when it exists, otherwise from
+processed_data/{folder}/{run}.json
+a cached run is reused while its source file is unchanged,
+least recently used runs are evicted when the cache exceeds its byte budget,
+memory mapped columns are not counted as they are not resident
+the cache is shared by the threads of the process (snakemake runs
+the rules in threads), its bookkeeping is guarded by a lock
+callers get shallow copies of the cached run dicts, keys can be set and
+deleted, the values are shared and should not be modified in place
+(columns of the columnar store are read-only memory maps)
+"""
+
+import mmap
+import numpy as np
+import os
+import re
+import threading
+from collections import OrderedDict
+import src.io.readwrite as rw
+import src.profiling.profiler as profiler
+
+def is_mapped(array):
+    """
+    return true if an array is a memory map or a view to one
+    """
+    while isinstance(array, np.ndarray):
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return isinstance(array, mmap.mmap)
+
+def nbytes(value):
+    """
+    return approximate resident size of a run or its value in bytes,
+    memory mapped arrays are not counted
+    """
+    if isinstance(value, np.ndarray):
+        return 0 if is_mapped(value) else value.nbytes
+    if isinstance(value, rw.LazyRun): # only the decoded and assigned values
+        return nbytes(value.decoded) + nbytes(value.cache)
+    if isinstance(value, dict):
+        return sum(nbytes(val) for val in value.values())
+    if isinstance(value, (list, tuple)):
+        return 8*len(value) + sum(nbytes(val) for val in value
+                    if isinstance(val, (list, tuple, dict, str, np.ndarray)))
+    if isinstance(value, str):
+        return len(value)
+    return 8
+
+def run_number(filename):
+    """
+    return running number N of exp_N.json for sorting
+    """
+    match = re.search(r'(\d+)', filename)
+    return int(match.group(1)) if match else 0
+
+class ExperimentRepository:
+    """
+    cache of processed runs keyed by (folder, run)
+    path: processed data folder
+    max_bytes: byte budget of the cached runs
+    validate: 'mtime' compares modification time and size of the source file,
+        'hash' compares sha1 of its content
+    mmap_mode: memory map mode of the columnar store, None reads to memory
+    lazy: runs loaded from json decode their values on first access (rw.LazyRun)
+    """
+    def __init__(self, path = 'processed_data/', max_bytes = 2**30,
+                validate = 'mtime', mmap_mode = 'r', lazy = False):
+        if validate not in ('mtime', 'hash'):
+            raise ValueError("unknown validate")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.validate = validate
+        self.mmap_mode = mmap_mode
+        self.lazy = lazy
+        self.entries = OrderedDict() # (folder, run) -> (signature, run, size)
+        # snakemake runs the rules in threads of one process, the entries
+        # are looked up and evicted under the lock, runs are loaded outside it
+        self.lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def store_file(self, folder):
+        return f'{self.path}{folder}.npz'
+
+    def run_file(self, folder, run):
+        return f'{self.path}{folder}/{run}.json'
+
+    def signature(self, filepath):
+        """
+        return signature of a source file, changes when the file changes
+        """
+        return rw.file_signature(filepath, self.validate)
+
+    def signatures(self, folder, runs):
+        """
+        return dict of run -> signature of its source file
+        """
+        store = self.store_file(folder)
+        if os.path.exists(store):
+            return dict.fromkeys(runs, self.signature(store))
+        return {run: self.signature(self.run_file(folder, run)) for run in runs}
+
+    def runs(self, folder):
+        """
+        return names of the runs of a folder
+        """
+        filepath = self.store_file(folder)
+        if os.path.exists(filepath):
+            with np.load(filepath, allow_pickle = False) as f:
+                return list(f['runs'])
+        filenames = [filename[:-len('.json')] for filename in os.listdir(f'{self.path}{folder}')
+                    if filename.endswith('.json')]
+        return sorted(filenames, key = run_number)
+
+    @profiler.profiled()
+    def load_folder(self, folder, runs = None):
+        """
+        return list of run dicts of a folder, shallow copies of the cached runs
+        runs: names of the runs, defaults to all runs of the folder
+        """
+        if runs is None:
+            runs = self.runs(folder)
+        store = self.store_file(folder)
+        signatures = self.signatures(folder, runs)
+        ret = {}
+        missing = []
+        with self.lock:
+            for run in runs:
+                entry = self.entries.get((folder, run))
+                if entry is not None and entry[0] == signatures[run]:
+                    self.entries.move_to_end((folder, run))
+                    ret[run] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(run)
+            self.misses += len(missing)
+        if missing:
+            if os.path.exists(store):
+                arrays = rw.load_columnar_arrays(self.path, f'{folder}.npz', self.mmap_mode)
+                loaded = rw.split_runs(arrays, missing)
+            else:
+                if self.lazy:
+                    loaded = [rw.load_json_lazy(f'{self.path}{folder}/', f'{run}.json', self.validate)
+                              for run in missing]
+                else:
+                    loaded = [rw.load_json(f'{self.path}{folder}/', f'{run}.json') for run in missing]
+            for run, data in zip(missing, loaded):
+                self.put((folder, run), signatures[run], data)
+                ret[run] = data
+        return [ret[run].copy() for run in runs]
+
+    def load_run(self, folder, run):
+        """
+        return run dict of one run
+        """
+        return self.load_folder(folder, [run])[0]
+
+    def put(self, key, signature, data):
+        """
+        add run to the cache and evict least recently used runs over the budget
+        """
+        size = nbytes(data)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[2]
+            self.entries[key] = (signature, data, size)
+            self.size += size
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, (_, _, evicted) = self.entries.popitem(last = False)
+                self.size -= evicted
+
+    def invalidate(self, folder = None):
+        """
+        drop cached runs of a folder, or all runs
+        """
+        with self.lock:
+            for key in list(self.entries):
+                if folder is None or key[0] == folder:
+                    self.size -= self.entries.pop(key)[2]
+
+REPOSITORY = ExperimentRepository()
+
+def load_folder(folder, runs = None):
+    """
+    return list of run dicts of a folder from the default repository
+    """
+    return REPOSITORY.load_folder(folder, runs)
+
+def load_run(folder, run):
+    """
+    return run dict from the default repository
+    """
+    return REPOSITORY.load_run(folder, run)
+
+def signatures(folder, runs):
+    """
+    return dict of run -> signature of its source file in the default repository
+    """
+    return REPOSITORY.signatures(folder, runs)
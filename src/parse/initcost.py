@@ -0,0 +1,72 @@
+"""
+computational cost of initialization data taken from baseline runs
+
+initialization strategies:
+self: initialization data is acquired by the run itself, total time is true cost
+random: there is no heavy process for selecting secondary data,
+    only the cumulative cost of the acquisitions
+inorder: in addition to acquisition cost, there is cost of BO of the
+    initialization data, the total time of the baseline run
+"""
+
+import numpy as np
+
+STRATEGIES = ('self', 'random', 'inorder')
+
+def run_cost(data, initstrategy):
+    """
+    return cumulative cost of the initialization data of a baseline run
+    as array, or None for strategy self
+    """
+    if initstrategy == 'self':
+        return None
+    elif initstrategy == 'random':
+        return np.cumsum(np.asarray(data['acqtime'], dtype = float))
+    elif initstrategy == 'inorder':
+        return np.array(data['totaltime'], dtype = float)
+    raise ValueError("unknown initstrategy")
+
+def folder_costs(folder, initstrategy):
+    """
+    return costs of each run of a baseline folder, or None for strategy self
+    """
+    if initstrategy not in STRATEGIES:
+        raise ValueError("unknown initstrategy")
+    if initstrategy == 'self':
+        return None
+    return [run_cost(data, initstrategy) for data in folder]
+
+def select_costs(source_costs, i):
+    """
+    return initial data cost of the i:th run of an experiment,
+    baseline runs are reused cyclically
+    source_costs: folder_costs of each initialization data source
+    """
+    ret = []
+    for costs in source_costs:
+        if costs is None:
+            ret.append(None)
+        else:
+            ret.append(costs[i % len(costs)])
+    return ret
+
+def add_inittimes(totaltime, initial_data_cost, initpts):
+    """
+    return total times with the cost of initialization data added
+    initial_data_cost: cost of each source, None if initialization has been
+        through active acquisition
+    initpts: number of initial points from each source
+    the cost of a source is added to its initial points one by one and its
+    full cost to the rest of the run
+    """
+    totaltime = np.array(totaltime, dtype = float)
+    accounted_initpts = 0
+    for cost, n in zip(initial_data_cost, initpts):
+        if cost is not None:
+            cost = np.asarray(cost, dtype = float)
+            begin = max(accounted_initpts - 1, 0)
+            end = begin + n
+            totaltime[begin:end] += cost[:n]
+            totaltime[end:] += cost[n-1]
+        accounted_initpts += n
+    return totaltime
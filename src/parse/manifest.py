@@ -0,0 +1,80 @@
+"""
+manifest of parsed and preprocessed runs, used to skip unchanged runs
+
+processed_data/manifest.json maps raw name folder/exp_N to
+- raw: signature of the boss.out
+- parser_version: version of the parser that produced the json
+- bestacq: last best acquisition of the parsed (not offset) run
+- preprocess_key: hash of the preprocessing inputs (truemin, tolerances, costs)
+- json: signature of the processed json
+a signature is modification time, size and sha1 of a file
+"""
+
+import hashlib
+import json
+import os
+import src.io.readwrite as rw
+
+MANIFEST = 'manifest.json'
+
+def file_hash(filepath):
+    """
+    return sha1 of file content
+    """
+    sha = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def signature(filepath, old = None):
+    """
+    return signature of a file, or None if it does not exist
+    sha1 is reused from the old signature if modification time and size match
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    ret = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    if old is not None and all(old.get(key) == val for key, val in ret.items()):
+        ret['sha1'] = old['sha1']
+    else:
+        ret['sha1'] = file_hash(filepath)
+    return ret
+
+def signature_job(job):
+    """
+    signature for process pool
+    job: (file path, old signature or None)
+    """
+    return signature(*job)
+
+def same_content(old, new):
+    """
+    return true if two signatures are of the same content
+    """
+    return old is not None and new is not None and old['sha1'] == new['sha1']
+
+def input_key(*values):
+    """
+    return hash of json serializable values
+    """
+    text = json.dumps(values, sort_keys = True, default = rw.tolist)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+def load(path):
+    """
+    load manifest, or empty manifest if there is none
+    """
+    try:
+        return rw.load_json(path, MANIFEST)
+    except FileNotFoundError:
+        return {}
+
+def save(manifest, path):
+    """
+    save manifest, the old manifest is replaced only when the new one is written
+    """
+    rw.save_json(manifest, path, f'{MANIFEST}.tmp')
+    os.replace(f'{path}{MANIFEST}.tmp', f'{path}{MANIFEST}')
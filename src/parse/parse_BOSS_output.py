@@ -1,10 +1,56 @@
+"""
+parse boss.out files to run dicts saved as json
+
+the file is streamed line by line, see read_bossout, values of the
+sections are decoded in bulk to 2-D float arrays
+the parsed values that preprocessing overwrites are kept in the raw layer
+of the run, see src.parse.preprocess
+"""
+
 import numpy as np
+import itertools
 import json
 import os
+import re
 import sys
+from collections import Counter
+import src.io.readwrite as rw
+import src.parse.preprocess as preprocess
+
+# increase when the parsed output changes, runs parsed with another version are re-parsed
+PARSER_VERSION = 2
 
 def parsevalues(line, typecast = int, sep = None, idx = 1):
     return [typecast(val.strip(sep)) for val in line.split(sep)[idx:]]
+
+WHITESPACE = np.frombuffer(b' \t\n\r\v\f', dtype = np.uint8)
+
+def row_widths(text, rows):
+    """
+    count whitespace separated values on each line of text
+    """
+    chars = np.frombuffer(text.encode(), dtype = np.uint8)
+    blank = np.isin(chars, WHITESPACE)
+    starts = np.logical_not(blank)
+    starts[1:] &= blank[:-1]
+    newline = chars == ord('\n')
+    row = np.cumsum(newline) - newline
+    return np.bincount(row[starts], minlength = rows)[:rows]
+
+def decodevalues(lines):
+    """
+    decode value lines of a section to a 2-D float array with one
+    bulk conversion, rows of unequal length are returned as lists
+    """
+    if len(lines) == 0:
+        return np.empty((0, 0))
+    text = ''.join(lines)
+    values = np.fromstring(text, sep = ' ')
+    widths = row_widths(text, len(lines))
+    if values.size != widths.sum() or np.any(widths != widths[0]):
+        return [parsevalues(line,typecast = float,idx = 0) for line in lines]
+    return values.reshape(len(lines), widths[0])
+
 def save_to_json(path, filename, expname,json_path = None, json_name = None):
     """
     Parse results ans save dict to json
@@ -15,20 +61,118 @@ def save_to_json(path, filename, expname,json_path = None, json_name = None):
     jsonpath: path to folder where json file is to be stored, defaults to path
     """
     res = read_bossout(path, filename, expname)
+    preprocess.add_raw_layer(res) # parsed values overwritten by preprocessing
     if json_name is None:
             json_name = expname
     if json_path is None:
             json_path = path
     with open(os.path.expanduser(f'{json_path}{json_name}.json'),'w') as file:
         print(f'Writing to file: {json_path}{json_name}.json')
-        json.dump(res,file)
+        json.dump(res,file, default = rw.tolist)
+    return res
                        
+# markers of sections whose values are on the following line,
+# the lines are collected as text and decoded once per section
+VALUE_SECTIONS = {
+    '| Data point added to dataset': 'xy',
+    '| Best acquisition': 'bestacq',
+    '| Global minimum prediction': 'gmp',
+    '| Global minimum convergence': 'gmp_convergence',
+    '| GP model hyperparameters': 'GP_hyperparam',
+}
+
+def _read_itertime(ret, line):
+    ret['itertime'].append(float(parsevalues(line,typecast=str, idx = 3)[0]))
+    ret['totaltime'].append(parsevalues(line,typecast=float, idx = 7)[0])
+    return True
+
+def _read_acqtime(ret, line):
+    ret['acqtime'].append(parsevalues(line,typecast=float, idx = 6)[0])
+    return True
+
+def _read_initpts(ret, line):
+    if ret['initpts'] is not None: # only the first occurrence is used
+        return False
+    ret['initpts'] = parsevalues(line)
+    return True
+
+def _read_iterpts(ret, line):
+    if ret['iterpts'] is not None:
+        return False
+    ret['iterpts'] = parsevalues(line)
+    return True
+
+def _read_num_tasks(ret, line):
+    ret['num_tasks'] = parsevalues(line)[0]
+    return True
+
+def _read_bounds(ret, line):
+    bounds = parsevalues(' '.join(parsevalues(line, typecast = str,
+                                 idx = 1)), typecast = str,sep = ';')
+    ret['bounds']  =  [parsevalues(bound, typecast = float) for bound in bounds]
+    return True
+
+def _read_keyword(key):
+    def read(ret, line):
+        ret[key] = parsevalues(line, typecast = str, idx = 1)
+        return True
+    return read
+
+def _read_thetapriorparam(ret, line):
+    priorparams = parsevalues(' '.join(parsevalues(line, typecast = str,
+                                idx = 1)), typecast = str, sep = ';')
+    ret['thetapriorparam'] = [parsevalues(priorparam, typecast = float) for priorparam in priorparams]
+    return True
+
+# single line markers and their readers, in order of precedence
+LINE_READERS = {
+    'Iteration time [s]:': _read_itertime,
+    '| Objective function evaluated, time [s]': _read_acqtime,
+    'initpts': _read_initpts,
+    'iterpts': _read_iterpts,
+    'num_tasks': _read_num_tasks,
+    'bounds': _read_bounds,
+    'kernel': _read_keyword('kernel'),
+    'yrange': _read_keyword('yrange'),
+    'thetainit': _read_keyword('thetainit'),
+    'thetapriorparam': _read_thetapriorparam,
+}
+
+# precedence of the markers when a line holds more than one
+LINE_TAGS = {tag: i for i, tag in enumerate(list(VALUE_SECTIONS)+list(LINE_READERS))}
+# one scan per line finds every marker the line contains
+LINE_TAG_PATTERN = re.compile('|'.join(re.escape(tag) for tag in LINE_TAGS))
+def tag_letters(tags, exclude = 'eE'):
+    """
+    return letters such that every tag contains one of them, chosen greedily
+    by the number of tags containing the letter
+    exclude: letters of number text (1e-05), which would pass value lines
+    """
+    letters = []
+    remaining = list(tags)
+    while remaining:
+        counts = Counter(letter for tag in remaining for letter in set(tag)
+                    if letter.isalpha() and letter not in exclude)
+        letter = min(counts, key = lambda letter: (-counts[letter], letter))
+        letters.append(letter)
+        remaining = [tag for tag in remaining if letter not in tag]
+    return tuple(letters)
+
+# every marker contains one of these letters, lines without them
+# (rulers, titles, value lines) are skipped without the scan
+LINE_TAG_LETTERS = tag_letters(LINE_TAGS)
+
 def read_bossout(path, filename, expname):
     """
     Read boss.out and return results in a dict
     pathname: str, path to folder
     filename: str, name of boss output file (boss.out)
     expname: str, descriptive name of the experiment
+
+    the file is streamed line by line, markers are found with a single
+    pattern scan and dispatched through VALUE_SECTIONS and LINE_READERS,
+    values of a section are read from the line following its marker
+    and returned as 2-D float arrays
     """
     print(f'{path} {filename} {expname}')
     path = os.path.expanduser(path)
@@ -37,88 +181,48 @@ def read_bossout(path, filename, expname):
           'iterpts':None,
           'num_tasks':1,
            'obs':None,
-           'acqtime':None,
+           'acqtime':[],
            'bestacq':None,
            'gmp': None,
            'gmp_convergence':None,
            'GP_hyperparam':None,
-           'itertime':None,
-           'totaltime': None
+           'itertime':[],
+           'totaltime': []
           }
-    xy = []
-    acqtime = []
-    bestacq = []
-    gmp = []
-    gmp_convergence = []
-    gp_hyper = []
-    itertime = []
-    totaltime = []
+    sections = {section: [] for section in VALUE_SECTIONS.values()}
+    pending = None # section whose values are on the next line
     with open(''.join((path,filename)), 'r') as f:
-        lines = f.readlines()
-        ret['boss.in'] = lines[0:100]
-        for i in range(len(lines)):
-            line = lines[i]
-            if '| Data point added to dataset' in line:
-                line = lines[i+1]
-                xy.append(parsevalues(line,typecast = float,idx = 0))
-                
-            elif '| Best acquisition' in line:
-                line = lines[i+1]
-                bestacq.append(parsevalues(line,typecast = float,idx = 0))
-            
-            elif '| Global minimum prediction' in line:
-                line = lines[i+1]
-                gmp.append(parsevalues(line,typecast = float,idx = 0))
-            
-            elif '| Global minimum convergence' in line:
-                line = lines[i+1]
-                gmp_convergence.append(parsevalues(line,typecast = float,idx = 0))
-                
-            elif '| GP model hyperparameters' in line:
-                line = lines[i+1]
-                gp_hyper.append(parsevalues(line,typecast = float,idx = 0))
-            
-            elif 'Iteration time [s]:' in line:
-                itertime.append(float(parsevalues(line,typecast=str, idx = 3)[0]))
-                totaltime.append(parsevalues(line,typecast=float, idx = 7)[0])
-            
-            elif '| Objective function evaluated, time [s]' in line:
-                acqtime.append(parsevalues(line,typecast=float, idx = 6)[0])
-                
-            elif 'initpts' in line and ret['initpts'] is None:
-                ret['initpts'] = parsevalues(line)
-            elif 'iterpts' in line and ret['iterpts'] is None:
-                ret['iterpts'] = parsevalues(line)
-            elif 'num_tasks' in line:
-                ret['num_tasks'] = parsevalues(line)[0]
-            elif 'bounds' in line:
-                bounds = parsevalues(' '.join(parsevalues(line, typecast = str,
-                                             idx = 1)), typecast = str,sep = ';')
-                ret['bounds']  =  [parsevalues(bound, typecast = float) for bound in bounds]
-            elif 'kernel' in line:
-                ret['kernel'] = parsevalues(line, typecast = str, idx = 1)
-            elif 'yrange' in line:
-                ret['yrange'] = parsevalues(line, typecast = str, idx = 1)
-            elif 'thetainit' in line:
-                ret['thetainit'] = parsevalues(line, typecast = str, idx = 1)
-            elif 'thetapriorparam' in line:
-                priorparams = parsevalues(' '.join(parsevalues(line, typecast = str,
-                                            idx = 1)), typecast = str, sep = ';')
-                ret['thetapriorparam'] = [parsevalues(priorparam, typecast = float) for priorparam in priorparams]
+        ret['boss.in'] = list(itertools.islice(f, 100))
+        for line in itertools.chain(ret['boss.in'], f):
+            if pending is not None:
+                pending.append(line)
+                pending = None
+                continue
+            for letter in LINE_TAG_LETTERS:
+                if letter in line:
+                    break
+            else:
+                continue
+            tags = LINE_TAG_PATTERN.findall(line)
+            if not tags:
+                continue
+            if len(tags) > 1: # the first marker accepted wins
+                tags = sorted(set(tags), key = LINE_TAGS.get)
+            for tag in tags:
+                if tag in VALUE_SECTIONS:
+                    pending = sections[VALUE_SECTIONS[tag]]
+                    break
+                elif LINE_READERS[tag](ret, line):
+                    break
+    sections = {section: decodevalues(lines) for section, lines in sections.items()}
+    xy = sections['xy']
     ret['tasks'] = len(np.unique(np.array(xy)[:,-2]))
     if  ret['tasks'] not in [1,2,3]: # old boss
         ret['tasks'] = 1
         ret['dim'] = len(xy[0])-1
     else: # task source included
         ret['dim'] = len(xy[0])-2
-    ret['xy'] = xy
-    ret['acqtime'] = acqtime
-    ret['bestacq'] = bestacq
-    ret['gmp'] = gmp
-    ret['gmp_convergence'] = gmp_convergence
-    ret['GP_hyperparam'] = gp_hyper
-    ret['itertime'] = itertime
-    ret['totaltime'] = totaltime
+    ret.update(sections)
 
     if len(ret['initpts']) == 1: # add 0 secondary initpts
         ret['initpts'].append(0)
@@ -127,6 +231,6 @@ def read_bossout(path, filename, expname):
 
 def parse(inputfilepath, expname, outputfilepath):
     outfile = outputfilepath.split('.json')[0]
-    save_to_json('', inputfilepath, expname, '', outfile)
+    return save_to_json('', inputfilepath, expname, '', outfile)
 
     
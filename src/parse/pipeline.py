@@ -0,0 +1,201 @@
+"""
+parse boss.out files and preprocess the parsed runs in a process pool
+
+the work is done in stages, each stage is distributed over the pool:
+1. parse every boss.out that changed since the last run
+2. find truemin of every baseline source
+3. preprocess baselines
+4. collect initialization data costs from the baselines
+5. preprocess experiments (these need truemin and costs of their baselines)
+the runs of a folder are preprocessed in one task, with the convergence
+of the runs calculated at once
+
+the manifest (see src.parse.manifest) records the inputs of each run,
+a run is parsed again only if its boss.out, the parser version or its json
+changed, and preprocessed again only if its truemin, tolerances or
+initialization data costs changed
+the manifest is saved after each stage, so an interrupted call keeps the
+runs that were finished
+the preprocessed runs are updated to the run index (see src.io.index)
+the jobs of the pool are recorded as stages of the profile, see profiler.map
+"""
+
+import numpy as np
+import os
+from multiprocessing import Pool
+import src.io.index as index
+import src.io.readwrite as rw
+import src.parse.initcost as initcost
+import src.parse.manifest as manifest
+import src.parse.parse_BOSS_output as parse
+import src.parse.preprocess as preprocess
+import src.profiling.profiler as profiler
+
+def parse_run(job):
+    """
+    parse one boss.out to json
+    job: (input boss.out path, raw name folder/exp_N, output json path)
+    return last best acquisition of the run and signature of the json
+    """
+    infile, rawname, outfile = job
+    name = '_'.join(rawname.split('/exp_'))
+    data = parse.parse(infile, name, outfile)
+    return [float(val) for val in preprocess.get_bestacq(data)], manifest.signature(outfile)
+
+def get_truemin(bestacqs):
+    """
+    return lowest observed value of a baseline source
+    bestacqs: last best acquisitions of the runs of the source
+    """
+    bestacqs = np.array(bestacqs)
+    return [list(bestacqs[np.argmin(bestacqs[:,-1]),:])]
+
+def baseline_plustime(job):
+    """
+    return additional computational cost of initialization data
+    taken from each run of a baseline folder
+    job: (processed data path, baseline folder, run names, initialization strategy)
+    """
+    path, folder, filenames, initstrategy = job
+    if initstrategy == 'self': # total time is true computational cost
+        return None
+    # only acqtime or totaltime is read, runs are decoded lazily
+    folder = [rw.load_json_lazy(f'{path}{folder}/',f'{filename}.json') for filename in filenames]
+    return initcost.folder_costs(folder, initstrategy)
+
+def preprocess_folder(jobs):
+    """
+    set truemin, preprocess and save runs of one folder,
+    the convergence of the runs is calculated at once
+    jobs: list of (processed data path, folder, run name, truemin, tolerances,
+        initial data cost) of the runs
+    return list of signature of the saved json and its rows of the index
+    """
+    folder = []
+    for path, foldername, filename, truemin, tolerances, initial_data_cost in jobs:
+        data = rw.load_json(f'{path}{foldername}/',f'{filename}.json')
+        data['truemin'] = truemin
+        folder.append(preprocess.preprocess(data, tolerances, initial_data_cost,
+                                            convergence = False))
+    preprocess.calculate_folder_convergence(folder, varname = 'gmp', idx = -2)
+    ret = []
+    for (path, foldername, filename, *_), data in zip(jobs, folder):
+        # with the index of lazy loads, e.g. baseline_plustime
+        rw.save_json(data, f'{path}{foldername}/',f'{filename}.json', index = True)
+        ret.append((manifest.signature(f'{path}{foldername}/{filename}.json'),
+                    index.run_rows(foldername, filename, data)))
+    return ret
+
+def preprocess_changed(pool, jobs, entries, parsed, path):
+    """
+    preprocess runs that were parsed or whose preprocessing inputs changed
+    jobs: list of preprocess_folder jobs of single runs
+    entries: manifest, updated in place
+    parsed: raw names of the runs parsed in this call
+    path: processed data path of the index
+    return raw names of the preprocessed runs
+    """
+    keys = {}
+    for job in jobs:
+        rawname = f'{job[1]}/{job[2]}'
+        key = manifest.input_key(*job[3:])
+        if rawname in parsed or key != entries[rawname].get('preprocess_key'):
+            keys[rawname] = key
+    # one task per folder
+    folders = {}
+    for job in jobs:
+        if f'{job[1]}/{job[2]}' in keys:
+            folders.setdefault(job[1], []).append(job)
+    folders = list(folders.values())
+    rows = []
+    results = profiler.map(pool, preprocess_folder, folders, chunksize = 1, name = 'preprocess_folder')
+    for folder, result in zip(folders, results):
+        for job, (json_signature, row) in zip(folder, result):
+            rawname = f'{job[1]}/{job[2]}'
+            entries[rawname]['preprocess_key'] = keys[rawname]
+            entries[rawname]['json'] = json_signature
+            rows.append(row)
+    index.update(rows, path)
+    manifest.save(entries, path) # finished work survives an interrupted run
+    return list(keys)
+
+def parse_and_preprocess(parse_jobs, parsed_dict, config, workers = None,
+                        path = 'processed_data/'):
+    """
+    parse and preprocess runs that changed since the last call
+    parse_jobs: list of (boss.out path, raw name, output json path)
+    parsed_dict: experiment folder -> list of run names
+    config: preprocess configuration (baselines, experiments, tolerances)
+    workers: number of processes, defaults to config['workers'] or all cores
+    return raw names of the parsed and the preprocessed runs
+    """
+    if workers is None:
+        workers = config.get('workers') or os.cpu_count()
+    tolerances = config['tolerances']
+    baselines = config['baselines']
+    experiments = config.get('experiments', {})
+    entries = manifest.load(path)
+    parse_jobs = {job[1]: job for job in parse_jobs}
+    with Pool(workers) as pool:
+        with profiler.stage('parse'):
+            # parse runs whose boss.out, json or parser version changed
+            rawnames = list(parse_jobs)
+            old = [entries.get(rawname, {}) for rawname in rawnames]
+            raws = pool.map(manifest.signature_job,
+                        [(parse_jobs[rawname][0], entry.get('raw')) for rawname, entry in zip(rawnames, old)])
+            jsons = pool.map(manifest.signature_job,
+                        [(parse_jobs[rawname][2], entry.get('json')) for rawname, entry in zip(rawnames, old)])
+            parsed = []
+            for rawname, entry, raw, json_signature in zip(rawnames, old, raws, jsons):
+                if (not manifest.same_content(entry.get('raw'), raw)
+                        or not manifest.same_content(entry.get('json'), json_signature)
+                        or entry.get('parser_version') != parse.PARSER_VERSION):
+                    parsed.append(rawname)
+                    entries[rawname] = {'raw': raw, 'parser_version': parse.PARSER_VERSION}
+            results = profiler.map(pool, parse_run, [parse_jobs[rawname] for rawname in parsed],
+                        chunksize = 8, name = 'parse_run')
+            for rawname, (bestacq, json_signature) in zip(parsed, results):
+                entries[rawname]['bestacq'] = bestacq
+                entries[rawname]['json'] = json_signature
+            manifest.save(entries, path)
+            parsed = set(parsed)
+
+        with profiler.stage('preprocess'):
+            # truemin of each baseline source, the lowest observed value of its runs
+            sources = list(dict.fromkeys(baselines.values()))
+            truemins = {source: get_truemin([entries[f'{source}/{filename}']['bestacq']
+                        for filename in parsed_dict[source]]) for source in sources}
+
+            # baselines: save truemin as y_offset and offset all y values accordingly
+            jobs = []
+            for folder, source in baselines.items():
+                for filename in parsed_dict[folder]:
+                    jobs.append((path, folder, filename, truemins[source], tolerances, None))
+            preprocessed = preprocess_changed(pool, jobs, entries, parsed, path)
+
+            # other experiments
+            # table of additional times per source
+            sources = list(dict.fromkeys((baseline_folder, initstrategy)
+                        for folder in experiments for baseline_folder, initstrategy in experiments[folder]))
+            plustimes = profiler.map(pool, baseline_plustime,
+                        [(path, folder, parsed_dict[folder], initstrategy) for folder, initstrategy in sources],
+                        name = 'baseline_plustime')
+            plustimes = dict(zip(sources, plustimes))
+            jobs = []
+            for folder in experiments:
+                # read truemin values from baselines
+                truemin = []
+                for baseline_folder, _ in experiments[folder]:
+                    if baseline_folder in baselines:
+                        truemin.append(truemins[baselines[baseline_folder]][0])
+                    else:
+                        baseline_file = parsed_dict[baseline_folder][0]
+                        data = rw.load_json_lazy(f'{path}{baseline_folder}/',f'{baseline_file}.json')
+                        truemin.append(data['truemin'][0])
+                # save truemin values to experiments
+                source_costs = [plustimes[tuple(source)] for source in experiments[folder]]
+                for i, filename in enumerate(parsed_dict[folder]):
+                    initial_data_cost = initcost.select_costs(source_costs, i)
+                    jobs.append((path, folder, filename, truemin, tolerances, initial_data_cost))
+            preprocessed += preprocess_changed(pool, jobs, entries, parsed, path)
+    return sorted(parsed), preprocessed
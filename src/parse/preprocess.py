@@ -2,12 +2,50 @@ import yaml
 import json
 import os, sys
 import numpy as np
+import src.parse.initcost as initcost
+
+# parsed values that preprocessing overwrites, kept in data['raw']:
+# the y column of xy, gmp and bestacq (key: column index) and totaltime
+RAW_COLUMNS = {'xy': -1, 'gmp': -2, 'bestacq': -1}
+
+def add_raw_layer(data):
+    """
+    copy the parsed values that preprocessing overwrites to data['raw'],
+    called by the parser before the run is saved
+    """
+    data['raw'] = {key: [row[idx] for row in data[key]] for key, idx in RAW_COLUMNS.items()}
+    data['raw']['totaltime'] = list(data['totaltime'])
+    return data['raw']
+
+def raw_layer(data):
+    """
+    return parsed values of the values overwritten by preprocessing,
+    runs without them (parsed before the raw layer was added) have to be
+    parsed again, their values are already preprocessed
+    """
+    if 'raw' not in data:
+        raise ValueError(f"{data.get('name')} has no raw layer, parse it again from boss.out")
+    return data['raw']
+
+def restore_raw(data):
+    """
+    set the values overwritten by preprocessing to the parsed values
+    """
+    raw = raw_layer(data)
+    for key, idx in RAW_COLUMNS.items():
+        for row, value in zip(data[key], raw[key]):
+            row[idx] = value
+    data['totaltime'] = list(raw['totaltime'])
 
 def get_bestacq(data):
     """
-    return point x and output f(x) for lowest observed best acquisition
+    return point x and output f(x) for lowest observed best acquisition,
+    f(x) as parsed
     """
-    return np.array(data['bestacq'])[-1,:]
+    ret = np.array(data['bestacq'], dtype = float)[-1,:]
+    if 'raw' in data:
+        ret[RAW_COLUMNS['bestacq']] = data['raw']['bestacq'][-1]
+    return ret
 
 
 def y_offset(data):
@@ -31,80 +69,118 @@ def y_offset(data):
 
 
 
-def calculate_convergence(data, varname, idx):
+def convergence_counts(columns, tolerance_levels):
     """
-    calculates index of variable (from the rear),
-    after which the variable is less or equalthan the tolerance
+    return number of values from the rear of each column, after which
+    the values are less or equal than each tolerance level,
+    shape (number of columns, number of tolerance levels)
+
+    the columns are reversed and padded with inf to a 2D array,
+    the running maximum from the rear is nondecreasing, so the count is
+    the number of running maximum values less or equal than the tolerance
+    nan values do not break convergence
+    """
+    N = max([len(column) for column in columns] + [0])
+    values = np.full((len(columns), N), np.inf)
+    for i, column in enumerate(columns):
+        values[i, :len(column)] = np.asarray(column, dtype = float)[::-1]
+    values[np.isnan(values)] = -np.inf
+    running_max = np.maximum.accumulate(values, axis = 1)
+    tolerances = np.asarray(tolerance_levels, dtype = float)
+    return np.count_nonzero(running_max[:,:,None] <= tolerances, axis = 1)
+
+def set_convergence(data, varname, counts):
+    """
+    set BO iteration, total runtime and number of observations for
+    convergence at each tolerance level from convergence counts
     if the very last value of the variable is larger than tolerance, None is given
-    if no value is larger, N is returned
-
-    then, calculates BO iteration and total runtime for convergence at given level 
     """
-    # select right column and reverse the order
-    values = np.atleast_2d(data[varname])[:,idx][::-1]
+    N = len(data[varname])
     data[f'iterations_to_{varname}_convergence'] = [] # BO iterations
     data[f'totaltime_to_{varname}_convergence'] = [] # total runtime
     data[f'observations_to_{varname}_convergence'] = [] # total number of observations, including initpts
-    
-    for tolerance in data['tolerance_levels']:
-        i = 0
-        for value in values:
-            if value > tolerance:
-                break
-            i += 1
+    for i in counts:
+        i = int(i)
         if i == 0:
             iterations_to_convergence = None
             totaltime_to_convergence = None
             observations_to_convergence = None
         else:
-            iterations_to_convergence = len(values)-i
+            iterations_to_convergence = N-i
             totaltime_to_convergence = data['totaltime'][-i]
             observations_to_convergence = len(data['xy'])-i
         data[f'iterations_to_{varname}_convergence'].append(iterations_to_convergence)
         data[f'totaltime_to_{varname}_convergence'].append(totaltime_to_convergence)
         data[f'observations_to_{varname}_convergence'].append(observations_to_convergence)
 
+def calculate_convergence(data, varname, idx):
+    """
+    calculates index of variable (from the rear),
+    after which the variable is less or equalthan the tolerance
+    if the very last value of the variable is larger than tolerance, None is given
+    if no value is larger, N is returned
+
+    then, calculates BO iteration and total runtime for convergence at given level 
+    """
+    values = np.atleast_2d(data[varname])[:,idx]
+    counts = convergence_counts([values], data['tolerance_levels'])[0]
+    set_convergence(data, varname, counts)
+
+def calculate_folder_convergence(folder, varname, idx):
+    """
+    calculate_convergence for all runs of a folder at once,
+    the runs may have different number of iterations
+    """
+    columns = [np.atleast_2d(data[varname])[:,idx] for data in folder]
+    tolerance_levels = folder[0]['tolerance_levels'] if folder else []
+    if any(data['tolerance_levels'] != tolerance_levels for data in folder):
+        raise ValueError("runs have different tolerance levels")
+    for data, counts in zip(folder, convergence_counts(columns, tolerance_levels)):
+        set_convergence(data, varname, counts)
+
+def coregionalization(hyperparam, dim, tasks):
+    """
+    return coregionalization matrices B = W W^T + diag(kappa)
+    hyperparam: rows of GP hyperparameters [lengthscales, W, kappa],
+    shape (..., N_params), e.g. iterations of a run or runs of a folder stacked
+    return array of shape (..., tasks, tasks)
+    """
+    hyperparam = np.asarray(hyperparam, dtype = float)
+    if hyperparam.size == 0:
+        return np.empty(hyperparam.shape[:-1] + (tasks, tasks))
+    W = hyperparam[..., dim:-tasks]
+    W = W.reshape(W.shape[:-1] + (-1, tasks))
+    kappa = hyperparam[..., -tasks:]
+    return np.einsum('...ij,...kj->...ik', W, W) + kappa[..., None]*np.eye(tasks)
+
 def calculate_B(data):
     dim = data['dim']
     if dim == len(data['xy'][0])-1:
         data['B'] = None
     else:
-        data['B'] = []
-        tasks = data['tasks']
-        for row in data['GP_hyperparam']:
-            W = np.array(row[dim:-tasks]).reshape((-1,tasks))
-            Kappa = np.diag(row[-tasks:])
-            B = W.dot(W.T) + Kappa
-            data['B'].append([b for b in B.flatten()])
+        data['B'] = coregionalization(data['GP_hyperparam'], dim, data['tasks'])
 
 def add_inittimes(data, initial_data_cost):
     """
     Add computational cost from initialization data
     """
-    accounted_initpts = 0
-    for cost, initpts in zip(initial_data_cost, data['initpts']):
-        if cost is None: # if initialization has been through active acquisition
-            pass
-        else: # if initialization data has been taken from a baseline
-            begin = accounted_initpts
-            if accounted_initpts != 0:
-                begin -= 1
-            end = begin + initpts
-            for i in range(begin, end):
-                data['totaltime'][i] += cost[i-begin]
-            for i in range(end, len(data['totaltime'])):
-                data['totaltime'][i] += cost[initpts-1]
-            
-        accounted_initpts += initpts
-
-
-def preprocess(data, tolerance_levels = [0], initial_data_cost = None):
+    data['totaltime'] = initcost.add_inittimes(data['totaltime'],
+                    initial_data_cost, data['initpts'])
+
+
+def preprocess(data, tolerance_levels = [0], initial_data_cost = None,
+               convergence = True):
     """
     optionally add time taken for initialization data (acquisition time)
     calculate model time
     center and rescale output so that best acq of baseline is 0
     calculate convergence 
+    the derived values are recomputed from data['raw'], so preprocessing
+    can be repeated, for example with other tolerance levels
+    convergence: false leaves the convergence to be calculated for a whole
+        folder, see calculate_folder_convergence
     """
+    restore_raw(data)
 
     data['modeltime'] = [itertime-acqtime for itertime, acqtime in zip(data['itertime'], data['acqtime'])]
 
@@ -119,7 +195,8 @@ def preprocess(data, tolerance_levels = [0], initial_data_cost = None):
 
     ### gmp convergence
     data['tolerance_levels'] = tolerance_levels
-    calculate_convergence(data, varname = 'gmp', idx = -2)
+    if convergence:
+        calculate_convergence(data, varname = 'gmp', idx = -2)
 
     # calculate B
     calculate_B(data)
@@ -1,16 +1,21 @@
 import numpy as np
-import pandas as pd
 import json
-import matplotlib.pyplot as plt
-from scipy.stats import pearsonr, wilcoxon, mannwhitneyu
-import scipy.stats as ss
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.pipeline import make_pipeline
+import src.analyse.convergence as convergence
+import src.analyse.groupstats as groupstats
+import src.io.lazy as lazy
+import src.profiling.profiler as profiler
 
+# heavy modules are imported on first use
+pd = lazy.module('pandas')
+plt = lazy.module('matplotlib.pyplot')
+ss = lazy.module('scipy.stats')
+linear_model = lazy.module('sklearn.linear_model')
+preprocessing = lazy.module('sklearn.preprocessing')
+pipeline = lazy.module('sklearn.pipeline')
 
 
-def loewner(A, B):
+
+def loewner(A, B, tol = 0):
     """
     Return true, if A>=B
     where >= is loewner order (matrix comparison) 
@@ -18,41 +23,105 @@ def loewner(A, B):
     used to detect poor fits of coregionalization
     if [coregionalization matrix] > [measured covariance]is broken, 
     covariance matrix is overestimated / fitted poorly
+    A: (tasks, tasks) matrix, or flattened
+    B: stacked (..., tasks, tasks) matrices, e.g. all iterations of all runs,
+    or their flattened rows (..., tasks*tasks)
+    return array of 1 (A-B is positive semidefinite) or 0 of shape B.shape[:-2]
     """
-    ret_list = []
-    for b in B:
-        D = (A-b).reshape((2,2))
-        det = np.linalg.det(D)
-        ret = 1
-        if det < 0 or D[0,0] < 0:
-            ret = 0
-        ret_list.append(ret)
-    return ret_list
+    A = np.asarray(A, dtype = float)
+    tasks = int(round(np.sqrt(A.size)))
+    A = A.reshape((tasks, tasks))
+    B = np.asarray(B, dtype = float)
+    if B.shape[-2:] != (tasks, tasks):
+        B = B.reshape(B.shape[:-1] + (tasks, tasks))
+    D = A - B
+    D = (D + np.swapaxes(D, -1, -2))/2 # symmetric part
+    if D.size == 0:
+        return np.zeros(D.shape[:-2], dtype = int)
+    return (np.linalg.eigvalsh(D)[..., 0] >= -tol).astype(int)
 
 ## compare each number of secondary initpts
 ## to baseline with wilcoxon 2 sample signed rank test to see 
 ## when TL is faster than the baseline, also collect the lowest, 
 ## highest, median and mean expected improvement and their secondary initpts
 
-def indicator_loss(b_times, r_times, N = None, alpha = 0.1, method = mannwhitneyu):
+def average_ranks(values):
+    """
+    return ranks of the values on each row, tied values get their average rank,
+    and sum of t^3-t over the groups of t tied values on each row
+    values: 2D array
+    """
+    B, M = values.shape
+    order = np.argsort(values, axis = 1, kind = 'mergesort')
+    ordered = np.take_along_axis(values, order, axis = 1)
+    # groups of tied values, each row starts a new group
+    new_group = np.ones((B, M), dtype = bool)
+    new_group[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    group = np.cumsum(new_group.ravel()) - 1
+    position = np.tile(np.arange(1, M+1, dtype = float), B)
+    ties = np.bincount(group)
+    mean_rank = np.bincount(group, weights = position)/ties
+    ranks = np.empty((B, M))
+    np.put_along_axis(ranks, order, mean_rank[group].reshape(B, M), axis = 1)
+    group_row = np.repeat(np.arange(B), M)[new_group.ravel()]
+    tie_sum = np.bincount(group_row, weights = ties**3.0 - ties, minlength = B)
+    return ranks, tie_sum
+
+def mannwhitneyu_less(b, r):
     """
-    do wilxocon test to see if b_times - r_times median is less than 0
-    H0: it is
+    return p-values of one sided Mann-Whitney U tests of each row,
+    H0: b is not stochastically less than r
+    normal approximation with tie and continuity correction
+    b, r: 2D arrays of equal number of rows
     """
+    n1, n2 = b.shape[1], r.shape[1]
+    ranks, tie_sum = average_ranks(np.hstack((b, r)))
+    U = np.sum(ranks[:, :n1], axis = 1) - n1*(n1+1)/2
+    n = n1 + n2
+    T = 1 - tie_sum/(n**3 - n)
+    sd = np.sqrt(T*n1*n2*(n+1)/12)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        z = (U - n1*n2/2 + 0.5)/sd
+    return ss.norm.cdf(z)
+
+def wilson_interval(k, n, confidence = 0.95):
+    """
+    return Wilson score confidence interval of proportion k/n
+    """
+    z = ss.norm.ppf(1 - (1-confidence)/2)
+    p = k/n
+    center = (p + z**2/(2*n))/(1 + z**2/n)
+    half = z/(1 + z**2/n)*np.sqrt(p*(1-p)/n + z**2/(4*n**2))
+    return center - half, center + half
+
+def indicator_probability(b_times, r_times, N = None, alpha = 0.1, B = 1000,
+                          confidence = 0.95):
+    """
+    bootstrap Mann-Whitney U test to see if b_times is less than r_times
+    H0: it is not
+    B resamples of size N are drawn from both at once
+    return proportion of resamples where H0 is not rejected at level alpha,
+    and its confidence interval
+    """
+    b_times = np.asarray(b_times, dtype = float)
+    r_times = np.asarray(r_times, dtype = float)
     if N is None:
         N = min([len(b_times), len(r_times)])*5
-    b = np.random.choice(b_times, size = N, replace = True)
-    r = np.random.choice(r_times, size = N, replace = True)
-    #diff = b-r
-    #diff = diff[diff != 0]
-    # is the median of the differences b-r less than zero
-    test = method(b,r, alternative = 'less')
-    if test[1] < alpha:
-        # reject
-        return False
-    else:
-        return True
+    b = b_times[np.random.randint(len(b_times), size = (B, N))]
+    r = r_times[np.random.randint(len(r_times), size = (B, N))]
+    pvalues = mannwhitneyu_less(b, r)
+    k = np.count_nonzero(np.logical_not(pvalues < alpha))
+    low, high = wilson_interval(k, B, confidence)
+    return k/B, low, high
 
+def indicator_loss(b_times, r_times, N = None, alpha = 0.1, B = 1000):
+    """
+    return true if b_times is not significantly less than r_times
+    in at least half of the bootstrap resamples, see indicator_probability
+    """
+    return indicator_probability(b_times, r_times, N, alpha, B)[0] >= 0.5
+
+@profiler.profiled()
 def loss_function_table(c_speed, name):
     """
     Sample n convergence speed results from baseline (b_times)
@@ -70,26 +139,35 @@ def loss_function_table(c_speed, name):
     for initpts in initpts_list:
         r_times = c_speed[c_speed[:,0] == initpts, 1]
         #median_ixd = np.argsort(r_times)[len(r_times)//2]
-        # add initpts, mean (loss function), wx test (indicator loss function) if faster than baseline
-        faster.append([initpts, round(np.mean(r_times)/b_mean, 2), indicator_loss(b_times, r_times)])
-    faster = np.array(faster).reshape(-1, 3)
+        # add initpts, mean (loss function), mw test (indicator loss function) if faster than baseline
+        # and the bootstrap probability of the indicator with its confidence interval
+        probability, low, high = indicator_probability(b_times, r_times)
+        faster.append([initpts, round(np.mean(r_times)/b_mean, 2), probability >= 0.5,
+                       probability, low, high])
+    faster = np.array(faster, dtype = float).reshape(-1, 6)
     ret = pd.DataFrame({'experiment':name,
                         'secondary_initpts':faster[:,0],
                        'mean_loss':faster[:,1],
-                       'indicator_loss':faster[:,2]})
+                       'indicator_loss':faster[:,2],
+                       'indicator_probability':faster[:,3],
+                       'indicator_ci_low':faster[:,4],
+                       'indicator_ci_high':faster[:,5]})
     # normalize mean acquisition time
     # loss function minima -> 
     # plot loss function minima against number of secondary initpts
     return ret
         
 ## plot convergence and collect loss function table
-def plot_TL_convergence(filename, experiment_folders, baseline_folders):
+def plot_TL_convergence(filename, experiment_folders, baseline_folders,
+                        robust_outliers = False):
     """
     Plot for list of TL experiments:
     convergence speed to 0.1 kcal/mol in
     - BO iterations and CPU time
     - mean of both (statistical expected value)
     - linear trend
+    robust_outliers: detect outliers of CPU time with median and MAD
+    instead of mean and standard deviation
     """
     cputime_max = 0
     N = len(experiment_folders)
@@ -109,20 +187,20 @@ def plot_TL_convergence(filename, experiment_folders, baseline_folders):
             explist.append(exp)
 
 
-        convergence_iterations = []
-        convergence_times = []
-
+        secondary_initpts = []
         for exp in explist:
             if len(exp['initpts'])>1:
-                secondary_initpts = int(exp['initpts'][1])
+                secondary_initpts.append(int(exp['initpts'][1]))
             else:
-                secondary_initpts = 0
-            # convergence by iteration
-            convergence_iter = exp['iterations_to_gmp_convergence'][5]
-            convergence_iterations.append([secondary_initpts,convergence_iter])
-            # convergence by cpu time
-            convergence_time = exp['totaltime_to_gmp_convergence'][5]
-            convergence_times.append([secondary_initpts, convergence_time])
+                secondary_initpts.append(0)
+        # convergence by iteration and by cpu time from the convergence
+        # summaries, baseline runs first as in explist
+        summaries = [convergence.folder_summary(folder)
+                     for folder in (baseline_folders[i], experiment_folders[i])]
+        convergence_iterations = np.column_stack((secondary_initpts,
+                np.concatenate([summary['iterations'][:,5] for summary in summaries])))
+        convergence_times = np.column_stack((secondary_initpts,
+                np.concatenate([summary['totaltime'][:,5] for summary in summaries])))
             
            
 
@@ -139,7 +217,7 @@ def plot_TL_convergence(filename, experiment_folders, baseline_folders):
                                                            np.isnan(raw_rows[:,1]))),:]
         x_train = clean_rows[:,0].reshape(-1,1)
         y_train = clean_rows[:,1].reshape(-1,1)
-        reg = LinearRegression().fit(x_train, y_train)
+        reg = linear_model.LinearRegression().fit(x_train, y_train)
         x = np.unique(convergence_iterations[:,0]).reshape(-1,1)
         y = reg.predict(x)
         axs[0, i].plot(x,y, color = 'red', label = 'trend', linewidth = 3)
@@ -168,20 +246,10 @@ def plot_TL_convergence(filename, experiment_folders, baseline_folders):
                                                            np.isnan(raw_rows[:,1]))),:]
         clean_rows = clean_rows.reshape(-1,2)
         #outliers = clean_rows[clean_rows[:,1] > cputime_max,:]
-        # outlier if more than 2 stds off the mean
-        outlier_idx = []
-        for row in clean_rows:
-            initpts = row[0]
-            val = row[1]
-            obs = clean_rows[clean_rows[:,0] == initpts,:]
-            #obs = obs[obs != row]
-            m = np.mean(obs)
-            sd = np.std(obs)
-            if (val - m) / sd > 2.5: # z-score - assuming normal
-                # distribution only 0.5% of data should be at least this far
-                outlier_idx.append(True)
-            else:
-                outlier_idx.append(False)
+        # outlier if more than 2.5 stds above the mean of the same secondary initpts
+        # z-score - assuming normal distribution only 0.5% of data should be at least this far
+        outlier_idx = groupstats.outliers(clean_rows[:,0], clean_rows[:,1],
+                                          threshold = 2.5, robust = robust_outliers)
         outliers = clean_rows[outlier_idx, :]
         #clean_rows = clean_rows[clean_rows[:,1] <= cputime_max, :]
         clean_rows = clean_rows[np.logical_not(outlier_idx),:]
@@ -191,7 +259,7 @@ def plot_TL_convergence(filename, experiment_folders, baseline_folders):
         y_train = clean_rows[:,1].reshape(-1,1)
 
         degree=1
-        polyreg=make_pipeline(PolynomialFeatures(degree),LinearRegression())
+        polyreg=pipeline.make_pipeline(preprocessing.PolynomialFeatures(degree),linear_model.LinearRegression())
         polyreg.fit(x_train,y_train)
 
         x = np.unique(convergence_iterations[:,0]).reshape(-1,1)
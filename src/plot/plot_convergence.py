@@ -1,5 +1,8 @@
 import numpy as np
-import matplotlib.pyplot as plt 
+import src.analyse.convergence as convergence
+import src.io.lazy as lazy
+
+plt = lazy.module('matplotlib.pyplot') # imported on first use
 
 def plot_convergence_iter_time_distraction(folders, filename):
     """
@@ -8,6 +11,8 @@ def plot_convergence_iter_time_distraction(folders, filename):
     
     distraction rate is the proportion of experiments that do not reach given 
     convergence level
+    the values are read from the convergence summary of each folder
+    (src.analyse.convergence)
     """
     N = len(folders)
     fig, axs = plt.subplots(N, 3, figsize = (15,3*N),
@@ -18,36 +23,18 @@ def plot_convergence_iter_time_distraction(folders, filename):
     LARGE_SIZE = 30
 
     for i in range(N):
-        
-        ### BO iteration
-        ax = axs[i,0]
         folder = folders[i]
-        tolerances = []
-        times = []
-        tolerances_lists = []
-        times_lists = []
-        for exp in folder:
-            tolerances_list = []
-            times_list = []
-            for tolerance, totaltime in zip(exp['tolerance_levels'], exp['iterations_to_gmp_convergence']):
-                tolerances.append(tolerance)
-                times.append(totaltime)
-                tolerances_list.append(tolerance)
-                times_list.append(totaltime)
-            tolerances_lists.append(tolerances_list)
-            times_lists.append(times_list)
+        summary = convergence.folder_summary(folder)
+        tolerances = summary['tolerances']
         title = folder[0]['name'].split('_')[0]
+
+        ### BO iteration
+        ax = axs[i,0]
         ax.set_title(f'{i+1}a) {title}', loc = 'left', fontsize = LARGE_SIZE)
-        ax.scatter(times, tolerances, marker = 'x',
+        ax.scatter(summary['iterations'].ravel(), tolerances.ravel(), marker = 'x',
                    color = 'blue', alpha = 0.5,
                     label = 'observation')
-
-        times_lists = np.array(times_lists, dtype = float)
-        times_mean = np.nanmean(times_lists, axis = 0)
-
-        tolerances_lists = np.array(tolerances_lists, dtype = float)
-        tolerances_mean = np.nanmean(tolerances_lists, axis = 0)
-        ax.plot(times_mean, tolerances_mean, color = 'red',
+        ax.plot(summary['iterations_mean'], summary['tolerance_levels'], color = 'red',
              marker = 's', label = 'mean')
 
         ax.set_xlabel('BO iteration', fontsize = MEDIUM_SIZE)
@@ -56,33 +43,11 @@ def plot_convergence_iter_time_distraction(folders, filename):
         ax.legend(fontsize = SMALL_SIZE)
         ### cpu time
         ax = axs[i,1]
-        folder = folders[i]
-        tolerances = []
-        times = []
-        tolerances_lists = []
-        times_lists = []
-        for exp in folder:
-            tolerances_list = []
-            times_list = []
-            for tolerance, totaltime in zip(exp['tolerance_levels'], exp['totaltime_to_gmp_convergence']):
-                tolerances.append(tolerance)
-                times.append(totaltime)
-                tolerances_list.append(tolerance)
-                times_list.append(totaltime)
-            tolerances_lists.append(tolerances_list)
-            times_lists.append(times_list)
-        title = folder[0]['name'].split('_')[0]
         ax.set_title(f'{i+1}b) {title}', loc = 'left', fontsize = LARGE_SIZE)
-        ax.scatter(times, tolerances, marker = 'x',
+        ax.scatter(summary['totaltime'].ravel(), tolerances.ravel(), marker = 'x',
                    color = 'blue', alpha = 0.5,
                     label = 'observation')
-
-        times_lists = np.array(times_lists, dtype = float)
-        times_mean = np.nanmean(times_lists, axis = 0)
-
-        tolerances_lists = np.array(tolerances_lists, dtype = float)
-        tolerances_mean = np.nanmean(tolerances_lists, axis = 0)
-        ax.plot(times_mean, tolerances_mean, 'r', marker = 's', label = 'mean')
+        ax.plot(summary['totaltime_mean'], summary['tolerance_levels'], 'r', marker = 's', label = 'mean')
         ax.set_xlabel('CPU time (s)', fontsize = MEDIUM_SIZE)
         ax.set_ylabel('GMP conv. (kcal/mol)', fontsize = SMALL_SIZE)
         ax.set_yscale('log')
@@ -91,30 +56,9 @@ def plot_convergence_iter_time_distraction(folders, filename):
         ### Distraction rate
         # proportion of experiments that do not converge to a given tolerance level
         ax = axs[i,2]
-        folder = folders[i]
-        tolerances = []
-        times = []
-        tolerances_lists = []
-        times_lists = []
-        for exp in folder:
-            tolerances_list = []
-            times_list = []
-            for tolerance, totaltime in zip(exp['tolerance_levels'], exp['totaltime_to_gmp_convergence']):
-                tolerances.append(tolerance)
-                times.append(totaltime)
-                tolerances_list.append(tolerance)
-                times_list.append(totaltime)
-            tolerances_lists.append(tolerances_list)
-            times_lists.append(times_list)
-        title = folder[0]['name'].split('_')[0]
         ax.set_title(f'{i+1}c) {title}', loc = 'left', fontsize = LARGE_SIZE)
-
-        times_lists = np.array(times_lists, dtype = float)
-        distraction_rate = np.count_nonzero(np.isnan(times_lists), axis = 0)/len(times_lists)
-
-        tolerances_lists = np.array(tolerances_lists, dtype = float)
-        tolerances_mean = np.nanmean(tolerances_lists, axis = 0)
-        ax.barh(tolerances_mean, distraction_rate,
+        tolerances_mean = summary['tolerance_levels']
+        ax.barh(tolerances_mean, summary['distraction_rate'],
                 height = tolerances_mean*0.5, align='center',
                color = 'grey')
         ax.set_xlabel('distraction rate', fontsize = MEDIUM_SIZE)
@@ -1,72 +1,67 @@
+"""
+plot hyperparameter and coregionalization (B) trajectories of the prior
+selection experiments, mean, sd and range over the runs of a folder
+the figures and their panels are given in
+src/config/plot/prior_hyperparam_results.yaml
+
+the random vs sobol initialization comparison is used to see how much data
+effects the variability of the results compared to hyperparameter fitting process
+
+run from the repository root:
+python3 -m src.plot.plot_hyperparam_prior_results [config file]
+"""
+
 import numpy as np
-import matplotlib.pyplot as plt
-import json
 import sys
+import src.analyse.trajectory as trajectory
+import src.io.lazy as lazy
+import src.io.readwrite as rw
+import src.io.repository as repository
+
+plt = lazy.module('matplotlib.pyplot') # imported on first use
 
 SMALL_SIZE = 15
 MEDIUM_SIZE = 20
 LARGE_SIZE = 30
 
-
-def load_data(filepath):
-    with open(filepath,'r') as f:
-        data = json.load(f)
-    return data
+def folder_runs(foldername, namebasis, N_exp):
+    # folder of processed_data and names of the runs that are plotted
+    folder = foldername.split('/')[-1]
+    runs = [f'{namebasis}_{i}' for i in range(1,N_exp+1)]
+    return folder, runs
 
 def load_folder(foldername, namebasis, N_exp):
-    # load experiment folder
-    exp_list = []
-    for i in range(1,N_exp+1):
-        exp_list.append(load_data(f'{foldername}/{namebasis}_{i}.json'))
-    return exp_list
+    # load experiment folder of processed_data through the experiment repository
+    return repository.load_folder(*folder_runs(foldername, namebasis, N_exp))
 
 def experiments_mean_sd(experiments, variable, idx, use_abs = False):
-    # calculate mean, std and range for a variable
-    var = []
-    for exp in experiments:
-        var.append(np.atleast_2d(np.array(exp[variable]))[:,idx])
-    var = np.array(var)
-    if use_abs:
-        var = np.abs(var)
-    m = np.mean(var, axis = 0)
-    sd = np.std(var, axis = 0)
-    least = np.min(var, axis = 0)
-    most = np.max(var, axis = 0)
-    return m, sd, least, most
-
-"""
-plot results for sobol vs random initialization comparison
-this is used to see how much data effects the variability of the results compared to
-hyperparameter fitting process
-"""
-
-a1a3 = load_folder('processed_data/a1a3', 'exp', 30)
-a1a2 = load_folder('processed_data/a1a2', 'exp', 30)
-
-fig, axs = plt.subplots(1,2,
-                        figsize = (10,4),
-                       sharey = 'all', sharex = 'all',
-                       constrained_layout = True)
-folders = [a1a2, a1a3]
-inittypes = ['', ''] 
-for i in range(2):
-    # kappa
-    ax = axs[i]
-    m, sd, least, most = experiments_mean_sd(folders[i],
-                            'GP_hyperparam', 2)
+    # calculate mean, std and range for a variable at each BO iteration,
+    # runs are added one at a time and may have different lengths
+    # matrices of an iteration (e.g. B) are indexed as flattened rows
+    return trajectory.aggregate(experiments, variable, idx, use_abs).bands()
+
+def plot_panel(ax, folder, variable, idx, ylabel, label,
+               use_abs = False, check_lower = False):
+    """
+    plot mean, sd and range of a variable over the runs of a folder
+    label: panel label in the title, e.g. 2a
+    check_lower: draw mean-sd only if it is inside the range
+        (when kappa encodes variance)
+    """
+    m, sd, least, most = experiments_mean_sd(folder, variable, idx, use_abs = use_abs)
     x = np.arange(1, len(m)+1)
     ax.plot(x,m, color = 'black', label = 'mean', linewidth = 3)
     ax.plot(x,m+sd, color = 'blue',
             linestyle = 'dashed', label = 'sd', linewidth = 3)
-    if np.all(least <= m -sd): # when kappa encodes variance
-        ax.plot(x,m-sd, color = 'blue', 
+    if not check_lower or np.all(least <= m -sd):
+        ax.plot(x,m-sd, color = 'blue',
             linestyle = 'dashed', linewidth = 3)
     ax.plot(x,most, color = 'grey',
             linestyle = 'dotted', label = 'range', linewidth = 3)
     ax.plot(x,least, color = 'grey', linestyle = 'dotted', linewidth = 3)
-    title = folders[i][0]['name'].split('_')[0]
-    ax.set_title(f'{1+i}) {title} {inittypes[i]}', loc = 'left', fontsize = LARGE_SIZE)
-    ax.set_ylabel('variance', fontsize = MEDIUM_SIZE)
+    title = folder[0]['name'].split('_')[0]
+    ax.set_title(f'{label}) {title}', loc = 'left', fontsize = LARGE_SIZE)
+    ax.set_ylabel(ylabel, fontsize = MEDIUM_SIZE)
     ax.set_xlabel('BO iteration', fontsize = MEDIUM_SIZE)
     ax.spines['right'].set_visible(False)
     ax.spines['top'].set_visible(False)
@@ -76,262 +71,67 @@ for i in range(2):
               width = 3, length = 4, labelsize = SMALL_SIZE)
     ax.legend(fontsize = SMALL_SIZE)
 
-plt.savefig('results/figures/random_sobol_init_variance_variability.pdf')
-
-
-"""
-Plot results for 1 task heuristics
-"""
-# load data
-
-
-a2a1 = load_folder('processed_data/a2a1', 'exp', 30)
-a2a2 = load_folder('processed_data/a2a2', 'exp', 30)
-a2a3 = load_folder('processed_data/a2a3', 'exp', 30)
-a2a4 = load_folder('processed_data/a2a4', 'exp', 30)
-
-fig, axs = plt.subplots(5,3,
-                        figsize = (3*5,5*3),
-                       constrained_layout = True)
-folders = [a1a3, a2a1, a2a2, a2a3, a2a4]
-
-# plot 1st row without kappa and B (baseline)
-for ax in axs[0,:2]:
-    ax.axis('off')
-    
-if True:
-    i = 0
-    ax = axs[i,2]
-    m, sd, least, most = experiments_mean_sd(folders[i],
-                                'GP_hyperparam', 2,
-                                use_abs = True)
-    x = np.arange(1, len(m)+1)
-    ax.plot(x,m, color = 'black', label = 'mean', linewidth = 3)
-    ax.plot(x,m+sd, color = 'blue',
-            linestyle = 'dashed', label = 'sd', linewidth = 3)
-    ax.plot(x,m-sd, color = 'blue', 
-            linestyle = 'dashed', linewidth = 3)
-    ax.plot(x,most, color = 'grey',
-            linestyle = 'dotted', label = 'range', linewidth = 3)
-    ax.plot(x,least, color = 'grey', linestyle = 'dotted', linewidth = 3)
-    title = folders[i][0]['name'].split('_')[0]
-    ax.set_title(f'{i+1}c) {title}', loc = 'left', fontsize = LARGE_SIZE)
-    ax.set_ylabel('variance', fontsize = MEDIUM_SIZE)
-    ax.set_xlabel('BO iteration', fontsize = MEDIUM_SIZE)
-    ax.spines['right'].set_visible(False)
-    ax.spines['top'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.tick_params(axis = 'both',
-              width = 3, length = 4, labelsize = SMALL_SIZE)
-    ax.legend(fontsize = SMALL_SIZE)
-
-# plot rest of the experiments
-for i in range(1,5):
-    # kappa
-    ax = axs[i,0]
-    m, sd, least, most = experiments_mean_sd(folders[i],
-                            'GP_hyperparam', 3)
-    x = np.arange(1, len(m)+1)
-    ax.plot(x,m, color = 'black', label = 'mean', linewidth = 3)
-    ax.plot(x,m+sd, color = 'blue',
-            linestyle = 'dashed', label = 'sd', linewidth = 3)
-    if np.all(least <= m -sd): # when kappa encodes variance
-        ax.plot(x,m-sd, color = 'blue', 
-            linestyle = 'dashed', linewidth = 3)
-    ax.plot(x,most, color = 'grey',
-            linestyle = 'dotted', label = 'range', linewidth = 3)
-    ax.plot(x,least, color = 'grey', linestyle = 'dotted', linewidth = 3)
-    title = folders[i][0]['name'].split('_')[0]
-    ax.set_title(f'{1+i}a) {title}', loc = 'left', fontsize = LARGE_SIZE)
-    ax.set_ylabel('kappa', fontsize = MEDIUM_SIZE)
-    ax.set_xlabel('BO iteration', fontsize = MEDIUM_SIZE)
-    ax.spines['right'].set_visible(False)
-    ax.spines['top'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.tick_params(axis = 'both',
-              width = 3, length = 4, labelsize = SMALL_SIZE)
-    ax.legend(fontsize = SMALL_SIZE)
-    
-    # W
-    ax = axs[i,1]
-    m, sd, least, most = experiments_mean_sd(folders[i],
-                                'GP_hyperparam', 2,
-                                use_abs = True)
-    x = np.arange(1, len(m)+1)
-    ax.plot(x,m, color = 'black', label = 'mean', linewidth = 3)
-    ax.plot(x,m+sd, color = 'blue',
-            linestyle = 'dashed', label = 'sd', linewidth = 3)
-    ax.plot(x,m-sd, color = 'blue', 
-            linestyle = 'dashed', linewidth = 3)
-    ax.plot(x,most, color = 'grey',
-            linestyle = 'dotted', label = 'range', linewidth = 3)
-    ax.plot(x,least, color = 'grey', linestyle = 'dotted', linewidth = 3)
-    title = folders[i][0]['name'].split('_')[0]
-    ax.set_title(f'{1+i}b) {title}', loc = 'left', fontsize = LARGE_SIZE)
-    ax.set_ylabel('|w|', fontsize = MEDIUM_SIZE)
-    ax.set_xlabel('BO iteration', fontsize = MEDIUM_SIZE)
-    ax.spines['right'].set_visible(False)
-    ax.spines['top'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.tick_params(axis = 'both',
-              width = 3, length = 4, labelsize = SMALL_SIZE)
-    ax.legend(fontsize = SMALL_SIZE)
-    
-    # autocovariance
-    ax = axs[i,2]
-    m, sd, least, most = experiments_mean_sd(folders[i],
-                                'B', 0,
-                                use_abs = True)
-    x = np.arange(1, len(m)+1)
-    ax.plot(x,m, color = 'black', label = 'mean', linewidth = 3)
-    ax.plot(x,m+sd, color = 'blue',
-            linestyle = 'dashed', label = 'sd', linewidth = 3)
-    ax.plot(x,m-sd, color = 'blue', 
-            linestyle = 'dashed', linewidth = 3)
-    ax.plot(x,most, color = 'grey',
-            linestyle = 'dotted', label = 'range', linewidth = 3)
-    ax.plot(x,least, color = 'grey', linestyle = 'dotted', linewidth = 3)
-    title = folders[i][0]['name'].split('_')[0]
-    ax.set_title(f'{1+i}c) {title}', loc = 'left', fontsize = LARGE_SIZE)
-    ax.set_ylabel('autocovariance', fontsize = MEDIUM_SIZE)
-    ax.set_xlabel('BO iteration', fontsize = MEDIUM_SIZE)
-    ax.spines['right'].set_visible(False)
-    ax.spines['top'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.tick_params(axis = 'both',
-              width = 3, length = 4, labelsize = SMALL_SIZE)
-    ax.legend(fontsize = SMALL_SIZE)
-
-    plt.savefig('results/figures/prior_heuristic_results_1_task.pdf')
-
-########
-#
-### plot  2 task results (autocovariances and cross covariance)
-# compare to baselines
-
-a3b1 = load_folder('processed_data/a3b1', 'exp', 30)
-a3b2 = load_folder('processed_data/a3b2', 'exp', 30)
-a3b3 = load_folder('processed_data/a3b3', 'exp', 30)
-a3b4 = load_folder('processed_data/a3b4', 'exp', 30)
-a3b5 = load_folder('processed_data/a3b5', 'exp', 30)
-a1b2 = load_folder('processed_data/a1b2', 'exp', 30)
-
-fig, axs = plt.subplots(6,3,
-                        figsize = (3*5,6*3),
-                       sharey = 'all', sharex = 'all',
-                       constrained_layout = True)
-folders = [a1b2, None, a1a3, a3b1, a3b2, a3b3, a3b4, a3b5]
-
-### baselines
-for ax, i, enum in zip(axs[0,:], range(3), ['a','b', 'c']):
-    if folders[i] is None:
-        ax.axis('off')
-    else:
-        m, sd, least, most = experiments_mean_sd(folders[i],
-                                'GP_hyperparam', 2)
-        x = np.arange(1, len(m)+1)
-        ax.plot(x,m, color = 'black', label = 'mean', linewidth = 3)
-        ax.plot(x,m+sd, color = 'blue',
-                linestyle = 'dashed', label = 'sd', linewidth = 3)
-        ax.plot(x,m-sd, color = 'blue', 
-                linestyle = 'dashed', linewidth = 3)
-        ax.plot(x,most, color = 'grey',
-                linestyle = 'dotted', label = 'range', linewidth = 3)
-        ax.plot(x,least, color = 'grey', linestyle = 'dotted', linewidth = 3)
-        title = folders[i][0]['name'].split('_')[0]
-        ax.set_title(f'1{enum}) {title}', loc = 'left', fontsize = LARGE_SIZE)
-        ax.set_ylabel('variance', fontsize = MEDIUM_SIZE)
-        ax.set_xlabel('BO iteration', fontsize = MEDIUM_SIZE)
-        ax.spines['right'].set_visible(False)
-        ax.spines['top'].set_visible(False)
-        ax.spines['left'].set_visible(False)
-        ax.spines['bottom'].set_visible(False)
-        ax.tick_params(axis = 'both',
-              width = 3, length = 4, labelsize = SMALL_SIZE)
-        ax.legend(fontsize = SMALL_SIZE)
-
-### TL experiments
-
-for i in range(3,8):
-    # kappa
-    ax = axs[i-2,0]
-    m, sd, least, most = experiments_mean_sd(folders[i],
-                            'B', 0)
-    x = np.arange(1, len(m)+1)
-    ax.plot(x,m, color = 'black', label = 'mean', linewidth = 3)
-    ax.plot(x,m+sd, color = 'blue',
-            linestyle = 'dashed', label = 'sd', linewidth = 3)
-    ax.plot(x,m-sd, color = 'blue', 
-            linestyle = 'dashed', linewidth = 3)
-    ax.plot(x,most, color = 'grey',
-            linestyle = 'dotted', label = 'range', linewidth = 3)
-    ax.plot(x,least, color = 'grey', linestyle = 'dotted', linewidth = 3)
-    title = folders[i][0]['name'].split('_')[0]
-    ax.set_title(f'{i-1}a) {title}', loc = 'left', fontsize = LARGE_SIZE)
-    ax.set_ylabel('HF autocovariance', fontsize = MEDIUM_SIZE)
-    ax.set_xlabel('BO iteration', fontsize = MEDIUM_SIZE)
-    ax.spines['right'].set_visible(False)
-    ax.spines['top'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.tick_params(axis = 'both',
-              width = 3, length = 4, labelsize = SMALL_SIZE)
-    ax.legend(fontsize = SMALL_SIZE)
-    
-    # W
-    ax = axs[i-2,1]
-    m, sd, least, most = experiments_mean_sd(folders[i],
-                                'B', 1,
-                                use_abs = True)
-    x = np.arange(1, len(m)+1)
-    ax.plot(x,m, color = 'black', label = 'mean', linewidth = 3)
-    ax.plot(x,m+sd, color = 'blue',
-            linestyle = 'dashed', label = 'sd', linewidth = 3)
-    ax.plot(x,m-sd, color = 'blue', 
-            linestyle = 'dashed', linewidth = 3)
-    ax.plot(x,most, color = 'grey',
-            linestyle = 'dotted', label = 'range', linewidth = 3)
-    ax.plot(x,least, color = 'grey', linestyle = 'dotted', linewidth = 3)
-    title = folders[i][0]['name'].split('_')[0]
-    ax.set_title(f'{i-1}b) {title}', loc = 'left', fontsize = LARGE_SIZE)
-    ax.set_ylabel('cross covariance', fontsize = MEDIUM_SIZE)
-    ax.set_xlabel('BO iteration', fontsize = MEDIUM_SIZE)
-    ax.spines['right'].set_visible(False)
-    ax.spines['top'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.tick_params(axis = 'both',
-              width = 3, length = 4, labelsize = SMALL_SIZE)
-    ax.legend(fontsize = SMALL_SIZE)
-    
-    # b
-    ax = axs[i-2,2]
-    m, sd, least, most = experiments_mean_sd(folders[i],
-                                'B', 3,
-                                use_abs = True)
-    x = np.arange(1, len(m)+1)
-    ax.plot(x,m, color = 'black', label = 'mean', linewidth = 3)
-    ax.plot(x,m+sd, color = 'blue',
-            linestyle = 'dashed', label = 'sd', linewidth = 3)
-    ax.plot(x,m-sd, color = 'blue', 
-            linestyle = 'dashed', linewidth = 3)
-    ax.plot(x,most, color = 'grey',
-            linestyle = 'dotted', label = 'range', linewidth = 3)
-    ax.plot(x,least, color = 'grey', linestyle = 'dotted', linewidth = 3)
-    title = folders[i][0]['name'].split('_')[0]
-    ax.set_title(f'{i-1}c) {title}', loc = 'left', fontsize = LARGE_SIZE)
-    ax.set_ylabel('LF autocovariance', fontsize = MEDIUM_SIZE)
-    ax.set_xlabel('BO iteration', fontsize = MEDIUM_SIZE)
-    ax.spines['right'].set_visible(False)
-    ax.spines['top'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.tick_params(axis = 'both',
-              width = 3, length = 4, labelsize = SMALL_SIZE)
-    ax.legend(fontsize = SMALL_SIZE)
-    
-    plt.savefig('results/figures/prior_heuristic_results_2_task.pdf')
\ No newline at end of file
+def plot_figure(filename, figure, panels, folders):
+    """
+    plot one figure of the configuration
+    figure: subplot grid and panels of the figure
+    panels: panel types
+    folders: folder name -> list of run dicts
+    """
+    rows, cols = figure['shape']
+    fig, axs = plt.subplots(rows, cols,
+                        figsize = figure['figsize'],
+                       sharey = figure['share'], sharex = figure['share'],
+                       constrained_layout = True, squeeze = False)
+    drawn = set()
+    for panel in figure['panels']:
+        i, j = panel['ax']
+        plot_panel(axs[i,j], folders[panel['folder']], label = panel['label'],
+                   **panels[panel['panel']])
+        drawn.add((i, j))
+    for i in range(rows):
+        for j in range(cols):
+            if (i, j) not in drawn:
+                axs[i,j].axis('off')
+    plt.savefig(filename)
+
+def folder_names(config):
+    """
+    return names of the folders plotted in the configuration
+    """
+    return list(dict.fromkeys(panel['folder'] for figure in config['figures'].values()
+                for panel in figure['panels']))
+
+def figure_folders(figure, folders):
+    """
+    return the folders plotted in a figure
+    """
+    return {panel['folder']: folders[panel['folder']] for panel in figure['panels']}
+
+def load_folders(config, folders = None):
+    """
+    return folder name -> list of run dicts of the plotted folders
+    folders: already loaded folders, the rest are loaded through the
+        experiment repository
+    """
+    ret = dict(folders or {})
+    for name in folder_names(config):
+        if name not in ret:
+            ret[name] = load_folder(name, 'exp', config['runs'])
+    return ret
+
+def plot_figures(config, folders = None, path = 'results/figures/'):
+    """
+    plot all figures of the configuration to path/{figure name}.pdf
+    folders: already loaded folders, see load_folders
+    """
+    folders = load_folders(config, folders)
+    for figurename, figure in config['figures'].items():
+        plot_figure(f'{path}{figurename}.pdf', figure, config['panels'], folders)
+        plt.close('all')
+
+if __name__=='__main__':
+    args = sys.argv[1:]
+    config = rw.load_yaml('', args[0]) if args else \
+             rw.load_yaml('src/config/plot/', 'prior_hyperparam_results.yaml')
+    plot_figures(config)
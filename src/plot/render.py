@@ -0,0 +1,126 @@
+"""
+render independent figures in a process pool
+
+a figure job is (label, figure function, args, kwargs, seed), made with job(),
+the function gets precomputed data as arguments and saves the figure itself
+each job starts from the default rc parameters and a random state seeded
+from its label, and its figures are closed after it, so figures
+(e.g. bootstrap intervals) do not depend on the order or the process
+they are rendered in and are the same in every run
+the pool processes use the non-interactive Agg backend, they are started
+by a forkserver, as snakemake runs the rules in threads and forking a
+threaded process is not safe
+runs are passed to the jobs as Runs references and loaded in the process
+that renders the job, so memory mapped columns are not pickled as copies,
+convergence summaries of this process (see src.analyse.convergence) are
+passed to the pool processes
+each job is recorded as a stage of the profile named by its label,
+with the stages recorded in it, also when it is rendered in a pool process
+
+results, timings = render.render([
+    render.job(path, sumstat.plot_y_scatter_trellis, render.Runs('a1a1', 'a1b1'), path), ...])
+"""
+
+import numpy as np
+import os
+import time
+import zlib
+import multiprocessing
+import src.analyse.convergence as convergence
+import src.io.lazy as lazy
+import src.io.repository as repository
+import src.profiling.profiler as profiler
+
+matplotlib = lazy.module('matplotlib') # imported on first use
+plt = lazy.module('matplotlib.pyplot')
+
+def label_seed(label):
+    """
+    return seed of the random state of a job, crc32 of its label
+    """
+    return zlib.crc32(label.encode('utf-8'))
+
+def job(label, function, *args, **kwargs):
+    """
+    return figure job, label names the figure in the timings,
+    e.g. its output path, and seeds the random state of the job
+    """
+    return (label, function, args, kwargs, label_seed(label))
+
+class Runs:
+    """
+    reference to runs of experiment folders, loaded as one list of run dicts
+    through the experiment repository of the process that renders the job
+    folders: folder names, or (folder name, run names)
+    """
+    def __init__(self, *folders):
+        self.folders = [(folder, None) if isinstance(folder, str) else tuple(folder)
+                        for folder in folders]
+
+    def load(self):
+        ret = []
+        for folder, runs in self.folders:
+            ret += repository.load_folder(folder, runs)
+        return ret
+
+def resolve(value):
+    """
+    return value with Runs loaded, also the items of a list, tuple or dict
+    """
+    if isinstance(value, Runs):
+        return value.load()
+    if isinstance(value, (list, tuple)):
+        return type(value)(item.load() if isinstance(item, Runs) else item for item in value)
+    if isinstance(value, dict):
+        return {key: item.load() if isinstance(item, Runs) else item for key, item in value.items()}
+    return value
+
+def init_worker(summaries):
+    plt.switch_backend('Agg')
+    convergence.update_cache(summaries)
+
+def render_job(figure_job):
+    """
+    render one figure job
+    return result of the figure function and wall time of the job
+    """
+    label, function, args, kwargs, seed = figure_job
+    start = time.perf_counter()
+    matplotlib.rc_file_defaults()
+    np.random.seed(seed)
+    try:
+        with profiler.stage(label):
+            res = function(*[resolve(arg) for arg in args],
+                           **{key: resolve(arg) for key, arg in kwargs.items()})
+    finally:
+        plt.close('all')
+    return res, time.perf_counter() - start
+
+def render(jobs, workers = None):
+    """
+    render figure jobs concurrently
+    workers: number of processes, defaults to one per job up to the number
+        of cores, 1 renders in this process
+    return results of the figure functions in the order of the jobs,
+    and list of (label, seconds) of each job
+    """
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count())
+    if workers <= 1:
+        ret = [render_job(figure_job) for figure_job in jobs]
+    else:
+        context = multiprocessing.get_context('forkserver')
+        with context.Pool(workers, initializer = init_worker,
+                          initargs = (convergence.cached(),)) as pool:
+            # one job per task, figures take long compared to the transfer
+            ret = profiler.map(pool, render_job, jobs, chunksize = 1)
+    results = [res for res, _ in ret]
+    timings = [(figure_job[0], seconds) for figure_job, (_, seconds) in zip(jobs, ret)]
+    return results, timings
+
+def print_timings(timings):
+    """
+    print render time of each figure
+    """
+    for label, seconds in timings:
+        print(f'rendered {label} in {seconds:.2f} s')
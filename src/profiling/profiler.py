@@ -0,0 +1,289 @@
+"""
+profiling of pipeline rules and named stages
+
+a stage records
+- wall: wall time [s]
+- cpu: user and system time [s] of this process only, process wide so
+    overlapping stages of parallel rules share it
+- children_cpu: user and system time [s] of waited child processes,
+    e.g. os.system, shell commands and the processes of a closed pool
+- worker_cpu: cpu time [s] of the stages merged from pool workers
+    while the stage was open, see map
+- maxrss: peak resident set size [bytes] of the process or its children
+    at the end of the stage, a high-water mark of the whole process
+- rchar, read_bytes: bytes read through system calls and from storage,
+    from /proc/self/io, None where it is not available
+stages nest, a stage opened inside another is recorded with the stack
+of its parents, e.g. 'rule sumstat;load_folder'
+
+stages recorded in pool workers are lost with the worker process,
+profiler.map runs the jobs with a worker that returns the stages recorded
+in each job with its result, the parent merges them below its open
+stages, marked worker, their cpu is the cpu time of the worker process
+
+usage:
+with profiler.stage('rule sumstat'):
+    ...
+@profiler.profiled('loss_function_table')
+def loss_function_table(...):
+
+profiler.save writes profile.json (stages, totals per stack) and
+profile.collapsed, self wall time in milliseconds per stack for
+flamegraph.pl and speedscope
+"""
+
+import functools
+import json
+import os
+import resource
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+IO_KEYS = ('rchar', 'read_bytes')
+
+def read_io():
+    """
+    return dict of read counters of the process, values are None if
+    /proc/self/io is not available
+    """
+    ret = dict.fromkeys(IO_KEYS)
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                key, value = line.split(':')
+                if key in ret:
+                    ret[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return ret
+
+def maxrss():
+    """
+    return peak resident set size of the process or its children in bytes
+    """
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak*1024 # kilobytes on linux
+
+def sample():
+    """
+    return current wall time, cpu time and read counters
+    """
+    times = os.times()
+    ret = {'wall': time.perf_counter(),
+           'cpu': times.user + times.system,
+           'children_cpu': times.children_user + times.children_system}
+    ret.update(read_io())
+    return ret
+
+def difference(end, start):
+    """
+    return difference of two samples, None for unavailable counters
+    """
+    return {key: None if end[key] is None or start[key] is None else end[key] - start[key]
+            for key in end}
+
+class Profiler:
+    """
+    records of profiled stages, stages of each thread nest separately
+    """
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.start = sample()
+
+    def stack(self):
+        """
+        return open stages of the calling thread,
+        [name, start sample, child wall time, worker cpu time]
+        """
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    @contextmanager
+    def stage(self, name):
+        """
+        context manager that records a named stage
+        """
+        stack = self.stack()
+        frame = [name, sample(), 0., 0.]
+        stack.append(frame)
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            record = difference(sample(), frame[1])
+            stack.pop()
+            if stack:
+                stack[-1][2] += record['wall']
+            record['self_wall'] = record['wall'] - frame[2]
+            record['worker_cpu'] = frame[3]
+            if stack:
+                stack[-1][3] += frame[3]
+            record['maxrss'] = maxrss()
+            record['stack'] = ';'.join([parent[0] for parent in stack] + [name])
+            record['name'] = name
+            record['failed'] = failed
+            record['worker'] = False
+            with self.lock:
+                self.records.append(record)
+
+    def profiled(self, name = None):
+        """
+        decorator that records each call of a function as a stage,
+        named by the function name by default
+        """
+        def decorator(function):
+            stagename = function.__name__ if name is None else name
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(stagename):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def recording(self):
+        """
+        context manager that yields a list, filled with the records made
+        in the block, which are removed from this profiler,
+        stacks start from the block, for returning the records of a pool job
+        """
+        ret = []
+        stack = self.stack()
+        self.local.stack = []
+        with self.lock:
+            start = len(self.records)
+        try:
+            yield ret
+        finally:
+            self.local.stack = stack
+            with self.lock:
+                ret.extend(self.records[start:])
+                del self.records[start:]
+
+    def merge(self, records):
+        """
+        add records returned from a pool worker below the open stages of
+        the calling thread, their cpu time is added to the worker_cpu
+        of the open stages
+        """
+        stack = self.stack()
+        parents = [parent[0] for parent in stack]
+        merged = []
+        for record in records:
+            # the outermost stages of the job hold the cpu time of the job
+            if stack and ';' not in record['stack']:
+                stack[-1][3] += record['cpu'] + record['worker_cpu']
+            record = dict(record)
+            record['stack'] = ';'.join(parents + [record['stack']])
+            record['worker'] = True
+            merged.append(record)
+        with self.lock:
+            self.records.extend(merged)
+
+    def totals(self):
+        """
+        return dict of stack -> calls, wall, self_wall, cpu, children_cpu,
+        worker_cpu, rchar, read_bytes summed over the calls and
+        maxrss of the calls
+        """
+        ret = OrderedDict()
+        with self.lock:
+            records = list(self.records)
+        for record in records:
+            total = ret.setdefault(record['stack'], {'calls': 0, 'wall': 0., 'self_wall': 0.,
+                        'cpu': 0., 'children_cpu': 0., 'worker_cpu': 0.,
+                        'rchar': 0, 'read_bytes': 0, 'maxrss': 0})
+            total['calls'] += 1
+            for key in ('wall', 'self_wall', 'cpu', 'children_cpu', 'worker_cpu') + IO_KEYS:
+                if record[key] is None or total[key] is None:
+                    total[key] = None
+                else:
+                    total[key] += record[key]
+            total['maxrss'] = max(total['maxrss'], record['maxrss'])
+        return ret
+
+    def collapsed(self):
+        """
+        return lines of collapsed stacks, self wall time in milliseconds
+        """
+        return [f"{stack} {int(round(1000*total['self_wall']))}\n"
+                for stack, total in self.totals().items()]
+
+    def save(self, path = 'results/profile/', filename = 'profile'):
+        """
+        write {filename}.json and {filename}.collapsed
+        """
+        os.makedirs(path, exist_ok = True)
+        total = difference(sample(), self.start)
+        total['maxrss'] = maxrss()
+        with self.lock:
+            records = list(self.records)
+        with open(f'{path}{filename}.json', 'w') as f:
+            json.dump({'total': total, 'totals': self.totals(), 'stages': records}, f, indent = 1)
+        with open(f'{path}{filename}.collapsed', 'w') as f:
+            f.writelines(self.collapsed())
+
+    def reset(self):
+        """
+        drop the records and restart the total time
+        """
+        with self.lock:
+            self.records = []
+        self.start = sample()
+
+PROFILER = Profiler()
+
+class Worker:
+    """
+    pool task that calls function with a job, in a stage if name is given,
+    and returns its result and the stages recorded in the job
+    """
+    def __init__(self, function, name = None):
+        self.function = function
+        self.name = name
+
+    def __call__(self, job):
+        with PROFILER.recording() as records:
+            if self.name is None:
+                res = self.function(job)
+            else:
+                with PROFILER.stage(self.name):
+                    res = self.function(job)
+        return res, records
+
+def map(pool, function, jobs, chunksize = None, name = None):
+    """
+    pool.map that keeps the stages recorded in the workers,
+    they are merged to the default profiler below the open stages
+    name: stage recorded for each job
+    """
+    ret = []
+    for res, records in pool.map(Worker(function, name), jobs, chunksize = chunksize):
+        PROFILER.merge(records)
+        ret.append(res)
+    return ret
+
+def stage(name):
+    """
+    record a named stage in the default profiler
+    """
+    return PROFILER.stage(name)
+
+def profiled(name = None):
+    """
+    decorator that records calls of a function in the default profiler
+    """
+    return PROFILER.profiled(name)
+
+def save(path = 'results/profile/', filename = 'profile'):
+    """
+    write the profile of the default profiler
+    """
+    PROFILER.save(path, filename)
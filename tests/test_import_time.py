@@ -0,0 +1,16 @@
+import os
+import pytest
+import src.benchmark.import_time as import_time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_snakefile_header_imports_no_heavy_modules():
+    header = ''.join(import_time.snakefile_header(os.path.join(ROOT, 'Snakefile')))
+    assert 'import src.io.lazy' in header
+    _, heavy = import_time.time_import(header, cwd = ROOT)
+    assert heavy == []
+
+@pytest.mark.parametrize('name', import_time.MODULES)
+def test_module_imports_no_heavy_modules(name):
+    _, heavy = import_time.time_import(f'import {name}', cwd = ROOT)
+    assert heavy == []